@@ -1,5 +1,4 @@
-from functools import lru_cache
-from typing import TYPE_CHECKING
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -7,25 +6,128 @@ from pydantic import Field
 class Settings(BaseSettings):
     SECRET_KEY: str = Field(..., min_length=32)
     DATABASE_URL: str
+    DATABASE_ASYNC: bool = False
+
+    # Read replicas for safe GET routes (JSON list of URLs). A user's
+    # reads stay on the primary for READ_YOUR_WRITES_SECONDS after they
+    # write; a replica that fails to connect is skipped for
+    # REPLICA_EJECT_SECONDS.
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_ROUTING: Literal["round_robin", "least_connections"] = "round_robin"
+    READ_YOUR_WRITES_SECONDS: float = Field(default=5.0, ge=0)
+    REPLICA_EJECT_SECONDS: float = Field(default=30.0, gt=0)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30, ge=5)
 
+    # Server (python -m app.serve). DB_CONNECTION_BUDGET is the total
+    # across all workers; each worker gets an equal share, which async
+    # mode splits between the sync and async engines.
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = Field(default=8000, ge=1, le=65535)
+    WEB_CONCURRENCY: int = Field(default=1, ge=1)
+    SERVER_BACKLOG: int = Field(default=2048, ge=1)
+    SERVER_KEEPALIVE_SECONDS: int = Field(default=5, ge=1)
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = Field(default=30, ge=0)
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    THREADPOOL_SIZE: int = Field(default=40, ge=1)
+    DB_CONNECTION_BUDGET: int = Field(default=15, ge=1)
+    DB_POOL_TIMEOUT_SECONDS: float = Field(default=30.0, gt=0)
+
     CORS_ORIGINS: list[str] = ["http://localhost:5173"]
     ENVIRONMENT: str = Field(default="development")
 
+    # Principal cache (get_current_user)
+    PRINCIPAL_CACHE_SIZE: int = Field(default=10_000, ge=0)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = Field(default=60.0, ge=0)
+
+    # Argon2 hashing pool (each hash holds ~100 MB while it runs)
+    PASSWORD_HASH_WORKERS: int = Field(default=2, ge=1)
+    PASSWORD_HASH_MAX_QUEUE: int = Field(default=32, ge=0)
+    PASSWORD_HASH_MAX_WAIT_SECONDS: float = Field(default=2.0, gt=0)
+
+    # Argon2 parameters: a named profile (see app/security.py), or
+    # "custom" with the values below, e.g. from
+    # `python -m app.security calibrate`
+    PASSWORD_HASH_PROFILE: Literal["strong", "balanced", "compact", "custom"] = "strong"
+    PASSWORD_HASH_MEMORY_KIB: int = Field(default=102400, ge=8192)
+    PASSWORD_HASH_TIME_COST: int = Field(default=2, ge=1)
+    PASSWORD_HASH_PARALLELISM: int = Field(default=8, ge=1)
+
+    # Auth rate limits, in requests per minute per key (0 = unlimited)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_MAX_BUCKETS: int = Field(default=100_000, ge=1)
+    RATE_LIMIT_LOGIN_PER_IP: int = Field(default=30, ge=0)
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: int = Field(default=10, ge=0)
+    RATE_LIMIT_REGISTER_PER_IP: int = Field(default=10, ge=0)
+    RATE_LIMIT_REGISTER_PER_ACCOUNT: int = Field(default=5, ge=0)
+    RATE_LIMIT_REFRESH_PER_IP: int = Field(default=60, ge=0)
+
+    # /metrics: shared snapshot dir when running several workers
+    METRICS_MULTIPROC_DIR: str | None = None
+    METRICS_FLUSH_INTERVAL_SECONDS: float = Field(default=5.0, ge=0)
+
+    # Per-request SQL accounting
+    SQL_DEBUG_HEADERS: bool = False
+    SLOW_QUERY_MS: float = Field(default=200.0, ge=0)
+    QUERY_REPEAT_WARN_THRESHOLD: int = Field(default=5, ge=2)
+
+    # Batch task endpoints
+    TASK_BATCH_MAX_ITEMS: int = Field(default=500, ge=1)
+
+    # GET /tasks/stream (Server-Sent Events)
+    SSE_HEARTBEAT_SECONDS: float = Field(default=15.0, gt=0)
+    SSE_MAX_PENDING_EVENTS: int = Field(default=100, ge=1)
+
+    # In-process cache of GET /tasks responses, in bytes (0 disables).
+    # Only used with a single worker: other workers' writes wouldn't
+    # invalidate it.
+    TASK_LIST_CACHE_MAX_BYTES: int = Field(default=32 * 1024 * 1024, ge=0)
+
+    # How often each worker picks up logouts made on other workers
+    REVOCATION_SYNC_SECONDS: float = Field(default=5.0, gt=0)
+
+    # Encode task reads straight from rows (see app/serializers.py)
+    FAST_TASK_SERIALIZATION: bool = False
+
     # 🔥 REMOVE env_file
     model_config = SettingsConfigDict(
         case_sensitive=True,
     )
 
 
-@lru_cache
+_active: Optional[Settings] = None
+
+
 def get_settings() -> Settings:
-    if TYPE_CHECKING:
-        return Settings(
-            SECRET_KEY="x" * 32,
-            DATABASE_URL="postgresql://placeholder",
-        )
+    """The Settings installed by create_app(), else read from the environment."""
+    global _active
+
+    if _active is None:
+        _active = Settings()  # type: ignore[call-arg]
+
+    return _active
+
+
+def use_settings(new: Optional[Settings]) -> Optional[Settings]:
+    """Make `new` the active Settings; returns the previous ones."""
+    global _active
+
+    previous, _active = _active, new
+    return previous
+
+
+class _SettingsProxy:
+    """
+    Stands in for the active Settings, so `from .config import settings`
+    reads nothing from the environment until a value is first used.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
 
-    return Settings()
 
-settings = get_settings()
\ No newline at end of file
+settings: Settings = _SettingsProxy()  # type: ignore[assignment]
@@ -1,36 +1,401 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import itertools
+import os
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Optional, Sequence, TypeVar, Union
 
-from app.config import Settings, get_settings
+from fastapi import Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlalchemy import Engine, Executable, Row, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
-settings = get_settings()
+from app.cache import TTLCache
+from app.config import Settings
+from app.metrics import MeteredAsyncQueuePool, MeteredQueuePool, instrument_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
+T = TypeVar("T")
 
-    # Connection pool tuning
-    pool_size=5,            # Number of persistent connections
-    max_overflow=10,        # Extra connections beyond pool_size
-    pool_timeout=30,        # Seconds to wait before giving up
-    pool_recycle=1800,      # Recycle connections every 30 min
-    pool_pre_ping=True,     # Detect dead connections
+# What get_db yields: a Session in sync mode, an AsyncSession in async mode
+DBSession = Union[Session, AsyncSession]
 
-    future=True,            # SQLAlchemy 2.x behavior
-)
 
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    future=True,
-)
+# In async mode requests run on the async engine; the sync engine only
+# serves background and admin work (revocation sync, CLIs). It gets
+# this many connections, taken out of the worker's share.
+SYNC_POOL_SIZE_IN_ASYNC_MODE = 1
+
+
+def pool_options(settings: Settings, connections: Optional[int] = None) -> dict:
+    """
+    Pool settings for one engine in one worker process. The
+    DB_CONNECTION_BUDGET is split evenly across WEB_CONCURRENCY workers
+    (or pass `connections` for a part of that share); a third stays
+    open and the rest is overflow for bursts.
+    """
+    if connections is None:
+        connections = max(settings.DB_CONNECTION_BUDGET // settings.WEB_CONCURRENCY, 1)
+    pool_size = max(connections // 3, 1)
+
+    return dict(
+        # Connection pool tuning
+        pool_size=pool_size,            # Number of persistent connections
+        max_overflow=connections - pool_size,  # Extra connections beyond pool_size
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,  # Seconds to wait before giving up
+        pool_recycle=1800,              # Recycle connections every 30 min
+        pool_pre_ping=True,             # Detect dead connections
+    )
+
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
+# ==========================
+# Async Mode
+# ==========================
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def engine_pool_options(settings: Settings) -> tuple[dict, Optional[dict]]:
+    """
+    (sync, async) pool settings for one worker. Without DATABASE_ASYNC
+    the sync engine gets the whole share; with it, the sync engine gets
+    SYNC_POOL_SIZE_IN_ASYNC_MODE connections and the async engine the
+    rest, so together they stay within the worker's share.
+    """
+    if not settings.DATABASE_ASYNC:
+        return pool_options(settings), None
+
+    share = max(settings.DB_CONNECTION_BUDGET // settings.WEB_CONCURRENCY, 1)
+    sync = pool_options(settings, SYNC_POOL_SIZE_IN_ASYNC_MODE)
+
+    return sync, pool_options(settings, max(share - SYNC_POOL_SIZE_IN_ASYNC_MODE, 1))
+
+
+def async_database_url(url: str) -> str:
+    """Swap a sync driver for its asyncio counterpart (psycopg 3 for Postgres)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# ==========================
+# Read Replicas
+# ==========================
+
+class Replica:
+    """
+    A read-only copy of the primary, with its own pool. Connection
+    failures eject it from routing for REPLICA_EJECT_SECONDS, after
+    which it is tried again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        settings: Settings,
+        sync_options: dict,
+        async_options: Optional[dict],
+    ) -> None:
+        self.name = name
+        self.eject_seconds = settings.REPLICA_EJECT_SECONDS
+        self.ejected_until = 0.0
+
+        self.engine = create_engine(
+            url,
+            **sync_options,
+            poolclass=MeteredQueuePool,
+            future=True,
+        )
+        instrument_engine(self.engine, name)
+
+        self.async_engine = None
+        if settings.DATABASE_ASYNC:
+            self.async_engine = create_async_engine(
+                async_database_url(url),
+                **async_options,
+                poolclass=MeteredAsyncQueuePool,
+            )
+            instrument_engine(self.async_engine.sync_engine, f"{name}_async")
+
+        for engine in (self.engine, self.async_engine):
+            if engine is not None:
+                event.listen(
+                    getattr(engine, "sync_engine", engine),
+                    "handle_error",
+                    self._on_error,
+                )
+
+    @property
+    def bind(self) -> Engine:
+        """The sync Engine sessions execute on (async mode included)."""
+        if self.async_engine is not None:
+            return self.async_engine.sync_engine
+        return self.engine
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > time.monotonic()
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or isinstance(
+            context.sqlalchemy_exception, OperationalError
+        ):
+            self.ejected_until = time.monotonic() + self.eject_seconds
+
+
+class RoutingSession(Session):
+    """
+    Runs statements on the replica get_db picked for this request, if
+    any, unless the request's user (recorded by get_current_user) wrote
+    within READ_YOUR_WRITES_SECONDS. Everything else uses the primary.
+    """
+
+    def get_bind(self, mapper=None, **kw):
+        replica = self.info.get("replica")
+
+        if replica is not None and not self._recent_writer():
+            return replica
+
+        return super().get_bind(mapper, **kw)
+
+    def _recent_writer(self) -> bool:
+        user_id = self.info.get("user_id")
+        return (
+            user_id is not None
+            and self.info["database"].recent_writers.get(user_id) is not None
+        )
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session: Session) -> None:
+    user_id = session.info.get("user_id")
+
+    if user_id is not None:
+        session.info["database"].recent_writers.set(user_id, True)
+
+
+def reads_from_primary(endpoint: Callable[..., T]) -> Callable[..., T]:
+    """Mark a GET route whose reads must never lag behind the primary."""
+    endpoint.reads_from_primary = True
+    return endpoint
+
+
+# ==========================
+# Engines
+# ==========================
+
+class Database:
+    """
+    One process's engines and session factories. The app lifespan (see
+    create_app) builds it at startup and disposes it at shutdown, so
+    importing the app never connects and every worker gets its own pool.
+    Replicas, if configured, each get pools sized like the primary's.
+
+    `options` are the settings of the pool serving requests (the async
+    one in async mode), `sync_options` those of the sync engine.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.sync_options, async_options = engine_pool_options(settings)
+        self.options = async_options or self.sync_options
+        self.routing = settings.REPLICA_ROUTING
+        self.replicas = [
+            Replica(f"replica{i}", url, settings, self.sync_options, async_options)
+            for i, url in enumerate(settings.DATABASE_REPLICA_URLS)
+        ]
+        self._round_robin = itertools.count()
+
+        # Users who committed recently, whose reads stay on the primary.
+        # Per process: with several workers, size the window for that.
+        self.recent_writers: TTLCache[int, bool] = TTLCache(
+            maxsize=100_000,
+            ttl=settings.READ_YOUR_WRITES_SECONDS,
+        )
+
+        self.engine = create_engine(
+            settings.DATABASE_URL,
+            **self.sync_options,
+            poolclass=MeteredQueuePool,
+            future=True,            # SQLAlchemy 2.x behavior
+        )
+        instrument_engine(self.engine, "primary")
+
+        self.SessionLocal = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=self.engine,
+            class_=RoutingSession,
+            info={"database": self},
+            future=True,
+        )
+
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+
+        if settings.DATABASE_ASYNC:
+            self.async_engine = create_async_engine(
+                async_database_url(settings.DATABASE_URL),
+                **async_options,
+                poolclass=MeteredAsyncQueuePool,
+            )
+            instrument_engine(self.async_engine.sync_engine, "async")
+
+            self.AsyncSessionLocal = async_sessionmaker(
+                bind=self.async_engine,
+                sync_session_class=RoutingSession,
+                info={"database": self},
+                autoflush=False,
+                # Objects must stay readable after commit without lazy IO
+                expire_on_commit=False,
+            )
+
+        _open_databases.add(self)
+
+    def _engines(self) -> list:
+        engines = [self.engine, self.async_engine]
+        for replica in self.replicas:
+            engines += [replica.engine, replica.async_engine]
+
+        return [engine for engine in engines if engine is not None]
+
+    def pick_replica(self) -> Optional[Replica]:
+        """A healthy replica by the configured policy, or None."""
+        healthy = [replica for replica in self.replicas if not replica.ejected]
+
+        if not healthy:
+            return None
+
+        if self.routing == "least_connections":
+            return min(healthy, key=lambda replica: replica.bind.pool.checkedout())
+
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def reads_replica(self, request: Request) -> Optional[Engine]:
+        """Where a request's reads may go: a replica for safe GETs."""
+        if not self.replicas or request.method not in ("GET", "HEAD"):
+            return None
+
+        route = request.scope.get("route")
+        if getattr(getattr(route, "endpoint", None), "reads_from_primary", False):
+            return None
+
+        replica = self.pick_replica()
+        return replica.bind if replica is not None else None
+
+    def reset_after_fork(self) -> None:
+        # A forked child must not reuse the parent's sockets; drop them
+        # without closing so the parent's connections stay intact.
+        for engine in self._engines():
+            getattr(engine, "sync_engine", engine).dispose(close=False)
+
+    async def dispose(self) -> None:
+        """Close every pooled connection; called on graceful shutdown."""
+        _open_databases.discard(self)
+
+        for engine in self._engines():
+            if isinstance(engine, Engine):
+                await run_in_threadpool(engine.dispose)
+            else:
+                await engine.dispose()
+
+
+_open_databases: "weakref.WeakSet[Database]" = weakref.WeakSet()
+
+
+def _reset_pools_after_fork() -> None:
+    for database in list(_open_databases):
+        database.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+# ==========================
+# Dependency
+# ==========================
+
+async def get_db(request: Request):
+    database: Database = request.app.state.database
+    replica = database.reads_replica(request)
+
+    if database.AsyncSessionLocal is not None:
+        async with database.AsyncSessionLocal() as db:
+            if replica is not None:
+                db.info["replica"] = replica
+            yield db
+        return
+
+    db = database.SessionLocal()
+    if replica is not None:
+        db.info["replica"] = replica
+
     try:
         yield db
     finally:
-        db.close()
+        # Returning the connection may issue a ROLLBACK
+        await run_in_threadpool(db.close)
+
+
+async def release_session(db: DBSession) -> None:
+    """
+    End the session's transaction and hand its connection back to the
+    pool now, for responses that outlive their database work (streams).
+    get_db still closes it again at the end, which is harmless.
+    """
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+async def run_in_session(
+    db: DBSession,
+    fn: Callable[..., T],
+    *args: Any,
+    **kwargs: Any,
+) -> T:
+    """
+    Run `fn(session, *args, **kwargs)` without blocking the event loop.
+
+    Handlers keep their ORM work in plain sync functions. With an
+    AsyncSession that work runs through `run_sync`, so IO is awaited on
+    the loop; with a sync Session it runs in the threadpool as a `def`
+    route would.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def stream_partitions(
+    db: DBSession,
+    stmt: Executable,
+    size: int,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Yield the rows of `stmt` in partitions of `size`, read from a
+    server-side cursor so memory stays flat however many rows match.
+    """
+    stmt = stmt.execution_options(yield_per=size)
+
+    if isinstance(db, AsyncSession):
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+        return
+
+    result = await run_in_threadpool(db.execute, stmt)
+    async for partition in iterate_in_threadpool(result.partitions()):
+        yield partition
@@ -1,17 +1,23 @@
+import hashlib
+import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..cache import TTLCache
+from ..database import DBSession, get_db, run_in_session
+from ..metrics import Counter, Gauge
 from ..models import UserDB
+from ..revocation import denylist
 from ..config import settings
 
 
-SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15  # short-lived access tokens
 REFRESH_TOKEN_EXPIRE_DAYS = 7     # long-lived refresh tokens
@@ -19,6 +25,69 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7     # long-lived refresh tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+# =============================
+# PRINCIPAL CACHE
+# =============================
+
+# Detached UserDB rows keyed by user id. Saves the users lookup that
+# would otherwise run on every authenticated request. Disabled until
+# the app lifespan sizes it from PRINCIPAL_CACHE_SIZE / _TTL_SECONDS.
+principal_cache: TTLCache[int, UserDB] = TTLCache(maxsize=0, ttl=0)
+
+
+Counter(
+    "principal_cache_requests_total",
+    "Principal cache lookups by result.",
+    ("result",),
+    callback=lambda: {
+        ("hit",): principal_cache.hits,
+        ("miss",): principal_cache.misses,
+    },
+)
+
+Gauge(
+    "principal_cache_size",
+    "Principals currently cached.",
+    callback=lambda: principal_cache.stats()["size"],
+)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """
+    Drop a cached user. ORM updates/deletes of UserDB are handled
+    automatically; call this after bulk or raw SQL changes to users.
+    """
+    principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, flush_context) -> None:
+    changed = {
+        obj.id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, UserDB)
+    }
+
+    if changed:
+        for user_id in changed:
+            invalidate_principal(user_id)
+
+        session.info.setdefault("changed_principals", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session: Session) -> None:
+    # Invalidate again once the change is visible, so a request that
+    # re-read the old row between flush and commit can't keep it cached.
+    for user_id in session.info.pop("changed_principals", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session: Session) -> None:
+    session.info.pop("changed_principals", None)
+
+
 # =============================
 # ACCESS TOKEN
 # =============================
@@ -37,11 +106,15 @@ def create_access_token(
 
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow(),
+        # Fractional, so "log out everywhere" cuts off at the instant it
+        # ran rather than the whole second
+        "iat": time.time(),
         "type": "access",
+        # Names this token for POST /auth/logout
+        "jti": secrets.token_urlsafe(16),
     })
 
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
 
 # =============================
@@ -62,53 +135,102 @@ def create_refresh_token(
 
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow(),
+        "iat": time.time(),
         "type": "refresh",
+        # Unique per token, so two logins in the same second still get
+        # distinct tokens (and distinct stored digests)
+        "jti": secrets.token_urlsafe(16),
     })
 
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+def hash_refresh_token(token: str) -> bytes:
+    """Fixed-size lookup key stored in place of the refresh token."""
+    return hashlib.sha256(token.encode()).digest()
 
 
 # =============================
 # CURRENT USER (ACCESS TOKEN ONLY)
 # =============================
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> UserDB:
+def _load_principal(db: Session, user_id: int) -> UserDB | None:
+    user = db.query(UserDB).filter(UserDB.id == user_id).first()
 
+    # Detach before sharing across requests so a later commit in this
+    # session can't expire the cached instance.
+    if user is not None:
+        db.expunge(user)
+
+    return user
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verified claims of a live access token, else 401. HS256 takes
+    microseconds, less than a threadpool hop would, so callers run it
+    inline; the revocation check is a couple of dict lookups.
+    """
     try:
         payload = jwt.decode(
             token,
-            SECRET_KEY,
+            settings.SECRET_KEY,
             algorithms=[ALGORITHM],
         )
+    except JWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-        if payload.get("type") != "access":
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid token type",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        user_id: int | None = payload.get("user_id")
+    if payload.get("type") != "access":
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid token type",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-        if user_id is None:
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid token payload",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    if payload.get("user_id") is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid token payload",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    except JWTError:
+    if denylist.is_revoked(
+        payload.get("jti"),
+        payload["user_id"],
+        payload.get("iat", 0),
+    ):
         raise HTTPException(
             status_code=401,
-            detail="Invalid token",
+            detail="Token revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    return payload
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: DBSession = Depends(get_db),
+) -> UserDB:
+
+    payload = decode_access_token(token)
+    user_id: int = payload["user_id"]
+
+    # Lets a routed session keep this user's reads on the primary
+    # right after they write (see database.RoutingSession)
+    db.info["user_id"] = user_id
+
+    user = principal_cache.get(user_id)
+
+    if user is not None:
+        return user
+
+    generation = principal_cache.generation
+    user = await run_in_session(db, _load_principal, user_id)
 
     if user is None:
         raise HTTPException(
@@ -117,4 +239,6 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    principal_cache.set(user_id, user, generation)
+
     return user
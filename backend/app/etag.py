@@ -0,0 +1,36 @@
+import hashlib
+
+
+# ==========================
+# Weak ETags
+# ==========================
+
+def make_etag(user_id: int, version: int, *variant: str) -> str:
+    """
+    Weak ETag for a representation of `user_id`'s tasks at `version`.
+    `variant` distinguishes representations of the same version (query
+    string, task id); the user id keeps two accounts sharing a browser
+    cache from ever matching each other's tags.
+    """
+    digest = hashlib.blake2s(
+        "\x00".join(variant).encode(),
+        digest_size=8,
+    ).hexdigest()
+
+    return f'W/"{user_id}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
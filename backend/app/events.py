@@ -0,0 +1,182 @@
+import asyncio
+import json
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Protocol
+
+from .config import settings
+from .metrics import Gauge
+
+
+# ==========================
+# Task Events
+# ==========================
+
+@dataclass(frozen=True)
+class TaskEvent:
+    type: str                       # "created" | "updated" | "deleted"
+    task_id: int
+    task: Optional[dict[str, Any]] = None
+
+    def to_sse(self) -> str:
+        data = self.task if self.task is not None else {"id": self.task_id}
+        return f"event: task.{self.type}\ndata: {json.dumps(data)}\n\n"
+
+
+# Sent instead of the events a slow subscriber missed; the client
+# should catch up through GET /tasks/changes.
+RESYNC = "event: resync\ndata: {}\n\n"
+HEARTBEAT = ": heartbeat\n\n"
+
+
+# ==========================
+# Subscriptions
+# ==========================
+
+class Subscription:
+    """
+    One listener's pending events, coalesced per task: only the latest
+    event for a task is kept, so a burst of edits costs one slot. When
+    more than `max_pending` tasks are waiting the backlog is dropped
+    and the listener gets a single resync instead.
+
+    Created/updated events must be applied as upserts, since coalescing
+    can turn "created, updated" into just "updated".
+    """
+
+    __slots__ = ("user_id", "max_pending", "_pending", "_overflowed", "_ready")
+
+    def __init__(self, user_id: int, max_pending: int) -> None:
+        self.user_id = user_id
+        self.max_pending = max_pending
+        self._pending: OrderedDict[int, TaskEvent] = OrderedDict()
+        self._overflowed = False
+        self._ready = asyncio.Event()
+
+    def push(self, events: list[TaskEvent]) -> None:
+        if not self._overflowed:
+            for event in events:
+                self._pending.pop(event.task_id, None)
+                self._pending[event.task_id] = event
+
+            if len(self._pending) > self.max_pending:
+                self._pending.clear()
+                self._overflowed = True
+
+        self._ready.set()
+
+    async def wait(self) -> None:
+        await self._ready.wait()
+
+    def drain(self) -> list[str]:
+        """The pending events as SSE messages, oldest first."""
+        self._ready.clear()
+
+        if self._overflowed:
+            self._overflowed = False
+            return [RESYNC]
+
+        messages = [event.to_sse() for event in self._pending.values()]
+        self._pending.clear()
+
+        return messages
+
+
+# ==========================
+# Broadcasters
+# ==========================
+
+class Broadcaster(Protocol):
+    """
+    Fans task events out to a user's open streams. The in-memory one
+    only reaches streams in this process; a cross-process backend (e.g.
+    Redis pub/sub feeding local subscriptions) implements the same
+    methods.
+    """
+
+    async def publish(self, user_id: int, events: Iterable[TaskEvent]) -> None:
+        ...
+
+    def subscribe(self, user_id: int) -> Subscription:
+        ...
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        ...
+
+    def subscriber_count(self) -> int:
+        ...
+
+
+class MemoryBroadcaster:
+    """
+    Subscriptions live on this process's event loop. An idle one is a
+    small object and a parked Event, so thousands per worker are cheap.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: defaultdict[int, set[Subscription]] = defaultdict(set)
+        self._count = 0     # read by /metrics from another thread
+
+    async def publish(self, user_id: int, events: Iterable[TaskEvent]) -> None:
+        subscribers = self._subscribers.get(user_id)
+
+        # `events` may be lazy; don't build them for nobody
+        if not subscribers:
+            return
+
+        events = list(events)
+        for subscription in subscribers:
+            subscription.push(events)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, settings.SSE_MAX_PENDING_EVENTS)
+        self._subscribers[user_id].add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+
+        if subscribers is not None and subscription in subscribers:
+            subscribers.remove(subscription)
+            self._count -= 1
+
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        return self._count
+
+
+broadcaster: Broadcaster = MemoryBroadcaster()
+
+Gauge(
+    "sse_subscribers",
+    "Open GET /tasks/stream connections in this process.",
+    callback=lambda: broadcaster.subscriber_count(),
+)
+
+
+# ==========================
+# Stream
+# ==========================
+
+async def event_stream(subscription: Subscription, heartbeat: float):
+    """
+    SSE body for one subscription: events as they arrive, and a comment
+    line after `heartbeat` idle seconds so proxies keep the connection.
+    Unsubscribes when the client goes away (the generator is closed).
+    """
+    try:
+        while True:
+            try:
+                async with asyncio.timeout(heartbeat):
+                    await subscription.wait()
+            except TimeoutError:
+                yield HEARTBEAT
+                continue
+
+            for message in subscription.drain():
+                yield message
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -1,28 +1,163 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
+
+from anyio import to_thread
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import inspect
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from .config import Settings, get_settings, use_settings
+from .database import Database
+from .dependencies.auth import principal_cache
+from .metrics import MetricsMiddleware, exposition, flush, start_multiproc
+from .query_stats import QueryStatsMiddleware
+from .rate_limit import MemoryBucketStorage, RateLimited, limiter
+from .response_cache import MemoryCacheBackend, task_list_cache
+from .revocation import denylist, keep_denylist_synced, load_denylist
+from .routers import auth, health, tasks
+from .security import HashPoolBusy, hash_pool, hash_profile, use_hash_profile
+
+logger = logging.getLogger("app")
+
+# ==========================
+# Lifespan
+# ==========================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Everything that reads settings or holds connections and threads is
+    built here, in the serving process, and torn down on shutdown.
+    Importing the app does none of it.
+    """
+    settings = app.state.settings or get_settings()
+    previous = use_settings(settings)
+
+    # Sync ORM work and JWT signing run on this threadpool
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    database = Database(settings)
+    app.state.database = database
 
-from .database import engine
-from .routers import auth, tasks
+    principal_cache.configure(
+        maxsize=settings.PRINCIPAL_CACHE_SIZE,
+        ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    )
+    limiter.storage = MemoryBucketStorage(settings.RATE_LIMIT_MAX_BUCKETS)
 
-app = FastAPI(
-    title="Task Manager API",
-    version="1.0.0"
-)
+    cache_bytes = settings.TASK_LIST_CACHE_MAX_BYTES
+    if cache_bytes and settings.WEB_CONCURRENCY > 1:
+        logger.warning(
+            "GET /tasks response cache disabled: it is per process and "
+            "WEB_CONCURRENCY=%d",
+            settings.WEB_CONCURRENCY,
+        )
+        cache_bytes = 0
+    task_list_cache.backend = MemoryCacheBackend(cache_bytes)
+    use_hash_profile(hash_profile(settings))
+    hash_pool.start(
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+        max_wait=settings.PASSWORD_HASH_MAX_WAIT_SECONDS,
+    )
+    start_multiproc()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173",
-                   "https://taskforge-1-ox2x.onrender.com"],  # Move to env later
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    await load_denylist(database)
+    revocation_sync = asyncio.create_task(
+        keep_denylist_synced(database, settings.REVOCATION_SYNC_SECONDS)
+    )
 
-app.include_router(auth.router)
-app.include_router(tasks.router)
+    try:
+        yield
+    finally:
+        revocation_sync.cancel()
+        with suppress(asyncio.CancelledError):
+            await revocation_sync
+        denylist.clear()
+        flush(force=True)
+        hash_pool.shutdown()
+        principal_cache.clear()
+        task_list_cache.backend.clear()
+        await database.dispose()
+        del app.state.database
+        use_settings(previous)
+
+
+# ==========================
+# Handlers
+# ==========================
+
+async def hash_pool_busy_handler(request: Request, exc: HashPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many concurrent sign-ins, retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
-@app.get("/")
 def root():
     return {"message": "Hello World!"}
+
+
+def metrics():
+    return PlainTextResponse(
+        exposition(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+# ==========================
+# App Factory
+# ==========================
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the API. `settings` defaults to the environment, read when
+    the app starts rather than now; engines, pools and caches are
+    created by the lifespan.
+    """
+    app = FastAPI(
+        title="Task Manager API",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173",
+                       "https://taskforge-1-ox2x.onrender.com"],  # Move to env later
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Retry-After", "ETag"],
+    )
+
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(health.router)
+    app.include_router(auth.router)
+    app.include_router(tasks.router)
+
+    app.add_exception_handler(HashPoolBusy, hash_pool_busy_handler)
+    app.add_exception_handler(RateLimited, rate_limited_handler)
+
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+
+    return app
+
+
+# For `uvicorn app.main:app`; settings are read at startup
+app = create_app()
@@ -0,0 +1,512 @@
+"""
+Minimal Prometheus text-format metrics, no client library or sidecar.
+
+Metrics live in a process-local registry. With METRICS_MULTIPROC_DIR
+set, every worker also snapshots its registry to
+`<dir>/metrics-<pid>.json` (at most every METRICS_FLUSH_INTERVAL_SECONDS,
+and on exit), and /metrics merges all snapshots: counters and
+histograms are summed across workers, gauges only across workers that
+are still alive.
+"""
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import settings
+from .query_stats import record_query
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+# ==========================
+# Metric Types
+# ==========================
+
+class Metric:
+    """
+    Base for all metric types. Instead of being updated in place, a
+    counter or gauge can be computed at collection time by `callback`,
+    which returns a value or a {label values: value} mapping.
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: Optional["Registry"] = None,
+        callback: Optional[Callable] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def samples(self) -> dict[LabelValues, object]:
+        if self.callback is not None:
+            value = self.callback()
+            if isinstance(value, dict):
+                return {labels: float(v) for labels, v in value.items()}
+            return {(): float(value)}
+
+        with self._lock:
+            return {
+                labels: list(value) if isinstance(value, list) else value
+                for labels, value in self._values.items()
+            }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Stored per label set as [per-bucket counts..., +Inf count, sum]."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+
+# ==========================
+# Registry + Exposition
+# ==========================
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable state of every metric in this process."""
+        return {
+            metric.name: {
+                "kind": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [
+                    [list(labels), value]
+                    for labels, value in metric.samples().items()
+                ],
+            }
+            for metric in self._metrics.values()
+        }
+
+
+REGISTRY = Registry()
+
+
+def _merge(snapshots: list[tuple[dict, bool]]) -> dict:
+    """Merge (snapshot, process alive) pairs into one snapshot."""
+    merged: dict = {}
+
+    for snapshot, alive in snapshots:
+        for name, family in snapshot.items():
+            if family["kind"] == "gauge" and not alive:
+                continue
+
+            target = merged.setdefault(name, {**family, "samples": {}})
+            samples = target["samples"]
+
+            for labels, value in family["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+
+                if current is None:
+                    samples[key] = value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    samples[key] = current + value
+
+    for family in merged.values():
+        family["samples"] = list(family["samples"].items())
+
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render(snapshot: dict) -> str:
+    lines = []
+
+    for name, family in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family["labelnames"]
+
+        for labels, value in family["samples"]:
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip([*family["buckets"], math.inf], value[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{name}_bucket{_labels(names, labels, le)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ==========================
+# Multi-process Snapshots
+# ==========================
+
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def flush(force: bool = False) -> None:
+    """Write this process's snapshot if a multiprocess dir is configured."""
+    global _last_flush
+
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL_SECONDS:
+        return
+
+    with _flush_lock:
+        _last_flush = now
+        path = _snapshot_path(directory, os.getpid())
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump(REGISTRY.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def exposition() -> str:
+    """Prometheus text for this process, or for all workers."""
+    directory = settings.METRICS_MULTIPROC_DIR
+    own = REGISTRY.snapshot()
+
+    if not directory:
+        return render(_merge([(own, True)]))
+
+    flush(force=True)
+    snapshots = [(own, True)]
+
+    for entry in os.scandir(directory):
+        if not (entry.name.startswith("metrics-") and entry.name.endswith(".json")):
+            continue
+
+        pid = int(entry.name[len("metrics-"):-len(".json")])
+        if pid == os.getpid():
+            continue
+
+        try:
+            with open(entry.path) as f:
+                snapshots.append((json.load(f), _pid_alive(pid)))
+        except (OSError, ValueError):
+            continue
+
+    return render(_merge(snapshots))
+
+
+def start_multiproc() -> None:
+    """Called at app startup: make sure the snapshot dir exists."""
+    if settings.METRICS_MULTIPROC_DIR:
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+
+
+# ==========================
+# HTTP Metrics
+# ==========================
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code.",
+    ("method", "route", "status"),
+)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, until the body is sent.",
+    ("method", "route"),
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware so streaming responses are timed to their last
+    chunk. Routes are labelled by template (e.g. /tasks/{task_id}) to
+    keep label cardinality bounded.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            HTTP_LATENCY.observe(time.perf_counter() - started, method, template)
+            HTTP_REQUESTS.inc(method, template, str(status_code))
+            flush()
+
+
+# ==========================
+# Database Metrics
+# ==========================
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time; _count is the number of queries.",
+    ("engine",),
+)
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for (or opening) a pooled connection.",
+    ("engine",),
+)
+
+# Instrumented engines by name. Weak, and dropped on dispose, so apps
+# rebuilt by tests or create_app() don't keep old engines alive; the
+# pool is read at scrape time because dispose() replaces it.
+_engines: "weakref.WeakValueDictionary[str, object]" = weakref.WeakValueDictionary()
+
+
+def _pool_status(read: Callable) -> Callable:
+    return lambda: {
+        (name,): read(engine.pool)
+        for name, engine in list(_engines.items())
+        if isinstance(engine.pool, QueuePool)
+    }
+
+
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Configured persistent connections per engine.",
+    ("engine",),
+    callback=_pool_status(lambda pool: pool.size()),
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ("engine",),
+    callback=_pool_status(lambda pool: pool.checkedout()),
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while below it).",
+    ("engine",),
+    callback=_pool_status(lambda pool: pool.overflow()),
+)
+
+
+class _WaitTimingMixin:
+    # _do_get is where QueuePool blocks on its queue (up to pool_timeout)
+    # or opens an overflow connection; there's no pool event for it.
+    _metrics_engine = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started, self._metrics_engine)
+
+
+class MeteredQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, name: str) -> None:
+    """
+    Time queries on `engine` (a sync Engine), feed per-request query
+    accounting, and expose its pool.
+    """
+    pool = engine.pool
+
+    if isinstance(pool, _WaitTimingMixin):
+        pool._metrics_engine = name
+
+    # A later engine under the same name replaces this one
+    _engines[name] = engine
+
+    @event.listens_for(engine, "engine_disposed")
+    def _forget_engine(disposed):
+        if _engines.get(name) is disposed:
+            del _engines[name]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+        if context is not None:
+            context._metrics_timing = True
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if context is not None:
+            context._metrics_timing = False
+        DB_QUERY_DURATION.observe(elapsed, name)
+        record_query(statement, elapsed, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(error_context):
+        # A failed statement never reaches after_cursor_execute; don't
+        # let its start time be paired with the next statement's end
+        context = error_context.execution_context
+        if context is not None and getattr(context, "_metrics_timing", False):
+            context._metrics_timing = False
+            error_context.connection.info["query_started"].pop()
+
+
+# ==========================
+# Password Hashing Metrics
+# ==========================
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Argon2 work on the hashing pool, by operation.",
+    ("operation",),
+)
+
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a hash waited in the pool queue before starting.",
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Hashes refused by admission control (answered with 503).",
+)
+
+
+# ==========================
+# Rate Limiting Metrics
+# ==========================
+
+RATE_LIMIT_REJECTED = Counter(
+    "rate_limit_rejected_total",
+    "Requests refused by a rate limit (answered with 429).",
+    ("limit",),
+)
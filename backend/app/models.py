@@ -1,7 +1,17 @@
 from datetime import datetime
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Boolean, ForeignKey, DateTime
+from sqlalchemy import (
+    DDL,
+    event,
+    String,
+    Integer,
+    Boolean,
+    ForeignKey,
+    DateTime,
+    Index,
+    LargeBinary,
+)
 from .database import Base
 
 
@@ -12,6 +22,13 @@ class UserDB(Base):
     email: Mapped[str] = mapped_column(String, unique=True, index=True)
     hashed_password: Mapped[str] = mapped_column(String)
 
+    # Bumped by every task write; backs the task ETags
+    tasks_version: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default="0",
+    )
+
     tasks = relationship(
         "TaskDB",
         back_populates="owner",
@@ -29,7 +46,7 @@ class TaskDB(Base):
     __tablename__ = "tasks"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    title: Mapped[str] = mapped_column(String, index=True)
+    title: Mapped[str] = mapped_column(String)
     priority: Mapped[int] = mapped_column(Integer)
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -37,16 +54,194 @@ class TaskDB(Base):
         ForeignKey("users.id", ondelete="CASCADE")
     )
 
+    # users.tasks_version of the last write to this row (GET /tasks/changes)
+    changed_version: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default="0",
+    )
+
     owner = relationship("UserDB", back_populates="tasks")
 
+    __table_args__ = (
+        # Covers GET /tasks keyset pages: user scope, optional completed
+        # filter, then the (priority, id) seek key.
+        Index(
+            "ix_tasks_user_completed_priority_id",
+            "user_id",
+            "completed",
+            "priority",
+            "id",
+        ),
+        # GET /tasks/changes: a user's rows written after a version
+        Index("ix_tasks_user_changed_version", "user_id", "changed_version"),
+    )
+
+
+# Deleted tasks, so GET /tasks/changes can report them
+class TaskTombstoneDB(Base):
+    __tablename__ = "task_tombstones"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    task_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_task_tombstones_user_version", "user_id", "version"),
+    )
+
+
+# Per-user, per-priority task counts behind GET /tasks/stats
+class TaskCounterDB(Base):
+    __tablename__ = "task_counters"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    priority: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    completed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# Title search (GET /tasks/search). Postgres uses a GIN index over
+# (user_id, tsvector) -- btree_gin lets the user scope ride in the same
+# index. SQLite uses an external-content FTS5 table kept in step by
+# triggers. Both are also created by the matching Alembic revision.
+TASK_SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        "CREATE INDEX ix_tasks_title_search ON tasks "
+        "USING gin (user_id, to_tsvector('simple', title))",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+        "title, content='tasks', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, title) VALUES (new.id, new.title); "
+        "END",
+        "CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title) "
+        "VALUES ('delete', old.id, old.title); "
+        "END",
+        "CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title) "
+        "VALUES ('delete', old.id, old.title); "
+        "INSERT INTO tasks_fts(rowid, title) VALUES (new.id, new.title); "
+        "END",
+    ],
+}
+
+
+# task_counters is maintained by triggers on tasks, so every write path
+# (single, batch, cascades, raw SQL) moves the counts in its own
+# transaction. Rows that drop to zero are removed. Drift can be
+# repaired with `python -m app.task_counters`.
+TASK_COUNTER_DDL = {
+    "postgresql": [
+        """
+        CREATE FUNCTION task_counters_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE task_counters
+                SET total = total - 1,
+                    completed = completed - OLD.completed::int
+                WHERE user_id = OLD.user_id AND priority = OLD.priority;
+
+                DELETE FROM task_counters
+                WHERE user_id = OLD.user_id
+                  AND priority = OLD.priority
+                  AND total = 0;
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO task_counters (user_id, priority, total, completed)
+                VALUES (NEW.user_id, NEW.priority, 1, NEW.completed::int)
+                ON CONFLICT (user_id, priority) DO UPDATE
+                SET total = task_counters.total + 1,
+                    completed = task_counters.completed + EXCLUDED.completed;
+            END IF;
+
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "CREATE TRIGGER task_counters_sync "
+        "AFTER INSERT OR DELETE OR UPDATE OF user_id, priority, completed "
+        "ON tasks FOR EACH ROW EXECUTE FUNCTION task_counters_apply()",
+    ],
+    "sqlite": [
+        "CREATE TRIGGER task_counters_ai AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO task_counters (user_id, priority, total, completed) "
+        "VALUES (new.user_id, new.priority, 1, new.completed) "
+        "ON CONFLICT (user_id, priority) DO UPDATE "
+        "SET total = total + 1, completed = completed + excluded.completed; "
+        "END",
+        "CREATE TRIGGER task_counters_ad AFTER DELETE ON tasks BEGIN "
+        "UPDATE task_counters "
+        "SET total = total - 1, completed = completed - old.completed "
+        "WHERE user_id = old.user_id AND priority = old.priority; "
+        "DELETE FROM task_counters "
+        "WHERE user_id = old.user_id AND priority = old.priority AND total = 0; "
+        "END",
+        "CREATE TRIGGER task_counters_au "
+        "AFTER UPDATE OF user_id, priority, completed ON tasks BEGIN "
+        "UPDATE task_counters "
+        "SET total = total - 1, completed = completed - old.completed "
+        "WHERE user_id = old.user_id AND priority = old.priority; "
+        "DELETE FROM task_counters "
+        "WHERE user_id = old.user_id AND priority = old.priority AND total = 0; "
+        "INSERT INTO task_counters (user_id, priority, total, completed) "
+        "VALUES (new.user_id, new.priority, 1, new.completed) "
+        "ON CONFLICT (user_id, priority) DO UPDATE "
+        "SET total = total + 1, completed = completed + excluded.completed; "
+        "END",
+    ],
+}
+
+# Schema objects the DDL above creates outside the metadata, so Alembic
+# autogenerate leaves them alone (see migrations/env.py). The triggers
+# and the counter function aren't reflected by autogenerate at all.
+DDL_MANAGED_TABLE_PREFIXES = ("tasks_fts",)     # FTS5 table and shadow tables
+DDL_MANAGED_INDEXES = {"ix_tasks_title_search"}
+
+for _ddl in (TASK_SEARCH_DDL, TASK_COUNTER_DDL):
+    for _dialect, _statements in _ddl.items():
+        for _statement in _statements:
+            event.listen(
+                TaskDB.__table__,
+                "after_create",
+                DDL(_statement).execute_if(dialect=_dialect),
+            )
+
+event.listen(
+    TaskDB.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"),
+)
+
+event.listen(
+    TaskDB.__table__,
+    "after_drop",
+    DDL("DROP FUNCTION IF EXISTS task_counters_apply()").execute_if(
+        dialect="postgresql"
+    ),
+)
+
 
 class RefreshTokenDB(Base):
     __tablename__ = "refresh_tokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    token: Mapped[str] = mapped_column(
-        String,
+    # SHA-256 of the signed refresh JWT; the token itself is never stored
+    token_hash: Mapped[bytes] = mapped_column(
+        LargeBinary(32),
         unique=True,
         index=True,
         nullable=False,
@@ -68,3 +263,28 @@ class RefreshTokenDB(Base):
     )
 
     user = relationship("UserDB", back_populates="refresh_tokens")
+
+
+# Revoked access tokens (jti set) and "log out everywhere" cutoffs (jti
+# NULL: the user's tokens issued at or before revoked_at). A row only
+# matters until expires_at, when the tokens it covers have expired
+# anyway. Workers mirror live rows in memory (see app/revocation.py).
+class TokenRevocationDB(Base):
+    __tablename__ = "token_revocations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    jti: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    revoked_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        index=True,
+    )
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        index=True,
+    )
@@ -0,0 +1,54 @@
+import base64
+import binascii
+
+
+# ==========================
+# Keyset Cursors
+# ==========================
+
+# Cursors are opaque to clients: url-safe base64 of "<priority>:<id>"
+# for the last row of the previous page.
+
+def encode_cursor(priority: int, task_id: int) -> str:
+    raw = f"{priority}:{task_id}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    """
+    Returns the (priority, id) seek key encoded in `cursor`.
+    Raises ValueError for anything that isn't a cursor we issued.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        priority, task_id = raw.split(":")
+        return int(priority), int(task_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Malformed cursor")
+
+
+# ==========================
+# Sync Tokens
+# ==========================
+
+# GET /tasks/changes tokens: url-safe base64 of "<user id>:<version>",
+# the user's tasks_version the client is up to date with.
+
+def encode_sync_token(user_id: int, version: int) -> str:
+    raw = f"{user_id}:{version}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_sync_token(token: str) -> tuple[int, int]:
+    """
+    Returns the (user_id, version) encoded in `token`.
+    Raises ValueError for anything that isn't a token we issued.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        user_id, version = raw.split(":")
+        return int(user_id), int(version)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Malformed sync token")
@@ -0,0 +1,144 @@
+"""
+Per-request SQL accounting.
+
+QueryStatsMiddleware opens a QueryStats for every HTTP request; the
+engine hooks in metrics.instrument_engine report each statement into
+it through a context variable (copied into threadpool calls, shared by
+AsyncSession.run_sync). At the end of the request repeated statements
+are reported as possible N+1 patterns, and slow statements are logged
+as they happen.
+"""
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from .config import settings
+
+logger = logging.getLogger("app.sql")
+
+
+@dataclass
+class QueryStats:
+    method: str = ""
+    path: str = ""
+    scope: Optional[dict] = None
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", None) or self.path
+
+    def record(self, statement: str, elapsed: float, executemany: bool = False) -> None:
+        self.count += 1
+        self.seconds += elapsed
+
+        # One executemany() may run as several batches of the same
+        # statement; that's a bulk write, not an N+1.
+        if not executemany:
+            self.statements[statement] += 1
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_observers: list[Callable[[QueryStats], None]] = []
+
+
+def record_query(statement: str, elapsed: float, executemany: bool = False) -> None:
+    """Called from the engine hooks for every executed statement."""
+    stats = _current.get()
+
+    if stats is not None:
+        stats.record(statement, elapsed, executemany)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            elapsed * 1000,
+            f"{stats.method} {stats.route}" if stats else "<no request>",
+            " ".join(statement.split()),
+        )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements run inside the block (same task/thread)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture_requests() -> Iterator[list[QueryStats]]:
+    """
+    Collect the QueryStats of every request finished inside the block.
+    Works across threads, e.g. with TestClient:
+
+        with capture_requests() as requests:
+            client.get("/tasks", headers=headers)
+        assert requests[-1].count <= 2
+    """
+    captured: list[QueryStats] = []
+    _observers.append(captured.append)
+    try:
+        yield captured
+    finally:
+        _observers.remove(captured.append)
+
+
+def _report_repeats(stats: QueryStats) -> None:
+    threshold = settings.QUERY_REPEAT_WARN_THRESHOLD
+
+    for statement, times in stats.statements.items():
+        if times >= threshold:
+            logger.warning(
+                "Possible N+1 in %s %s: statement ran %d times: %s",
+                stats.method,
+                stats.route,
+                times,
+                " ".join(statement.split()),
+            )
+
+
+class QueryStatsMiddleware:
+    """
+    Tracks queries per HTTP request. With SQL_DEBUG_HEADERS on, the
+    response carries X-DB-Query-Count and X-DB-Time-Ms for the queries
+    run before the response started.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(method=scope["method"], path=scope["path"], scope=scope)
+        token = _current.set(stats)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _report_repeats(stats)
+
+            for observer in list(_observers):
+                observer(stats)
@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from .config import settings
+from .metrics import RATE_LIMIT_REJECTED
+
+
+# ==========================
+# Bucket Storage
+# ==========================
+
+class BucketStorage(Protocol):
+    """
+    Where token buckets live. The in-memory store is per process; a
+    shared backend (e.g. Redis with a Lua script) only has to implement
+    `take` atomically and `clear`.
+    """
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Take one token from bucket `key`, which refills at `rate` tokens
+        per second up to `capacity`. Returns 0 when a token was taken,
+        otherwise the seconds until one will be available.
+        """
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class MemoryBucketStorage:
+    """
+    Thread-safe token buckets in an LRU of at most `max_buckets` keys.
+    Evicting a bucket forgets its debt, which only ever errs towards
+    letting a request through.
+    """
+
+    def __init__(
+        self,
+        max_buckets: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        now = self._clock()
+
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# ==========================
+# Limiter
+# ==========================
+
+class RateLimited(Exception):
+    """Raised by RateLimiter.check; answered with 429 + Retry-After."""
+
+    def __init__(self, limit: str, retry_after: int) -> None:
+        super().__init__(f"Rate limit {limit!r} exceeded")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Limit:
+    name: str
+    setting: str    # Settings field holding the requests per minute
+
+    @property
+    def per_minute(self) -> int:
+        return getattr(settings, self.setting)
+
+
+class RateLimiter:
+    def __init__(self, storage: BucketStorage) -> None:
+        self.storage = storage
+
+    def check(self, limit: Limit, key: str) -> None:
+        """
+        Spend one request of `limit` for `key` (a client IP, an email),
+        or raise RateLimited. Bursts of up to `per_minute` are allowed,
+        refilling evenly over the minute.
+        """
+        per_minute = limit.per_minute
+
+        if not settings.RATE_LIMIT_ENABLED or not per_minute:
+            return
+
+        wait = self.storage.take(
+            f"{limit.name}:{key}",
+            rate=per_minute / 60,
+            capacity=per_minute,
+        )
+
+        if wait:
+            RATE_LIMIT_REJECTED.inc(limit.name)
+            raise RateLimited(limit.name, max(math.ceil(wait), 1))
+
+
+# Storage is replaced at app startup, sized by RATE_LIMIT_MAX_BUCKETS
+limiter = RateLimiter(MemoryBucketStorage(max_buckets=0))
+
+LOGIN_PER_IP = Limit("login_ip", "RATE_LIMIT_LOGIN_PER_IP")
+LOGIN_PER_ACCOUNT = Limit("login_account", "RATE_LIMIT_LOGIN_PER_ACCOUNT")
+REGISTER_PER_IP = Limit("register_ip", "RATE_LIMIT_REGISTER_PER_IP")
+REGISTER_PER_ACCOUNT = Limit("register_account", "RATE_LIMIT_REGISTER_PER_ACCOUNT")
+REFRESH_PER_IP = Limit("refresh_ip", "RATE_LIMIT_REFRESH_PER_IP")
@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from .metrics import Counter, Gauge
+
+
+# ==========================
+# Cached Responses
+# ==========================
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes                     # Encoded JSON
+    etag: str
+    next_cursor: Optional[str] = None
+
+    def size(self, key: str) -> int:
+        # Body and key dominate; the rest is a rough per-entry overhead
+        return len(self.body) + len(key) + 200
+
+
+# ==========================
+# Backends
+# ==========================
+
+class CacheBackend(Protocol):
+    """
+    Where cached responses and per-user versions live. The in-memory
+    one is per process; a shared backend (e.g. Redis: INCR for `bump`,
+    SET with an expiry for entries) implements the same methods.
+    """
+
+    max_bytes: int      # 0: caching disabled
+
+    def version(self, user_id: int) -> int:
+        ...
+
+    def bump(self, user_id: int) -> None:
+        ...
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        ...
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> dict[str, int]:
+        ...
+
+
+class MemoryCacheBackend:
+    """
+    Thread-safe LRU bounded by the bytes it holds (`max_bytes` of 0
+    disables it). Versions are kept in a fixed array of striped
+    counters, so memory doesn't grow with the number of users; users
+    sharing a stripe just invalidate each other's entries.
+    """
+
+    STRIPES = 65536
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+
+        self._entries: OrderedDict[str, tuple[int, CachedResponse]] = OrderedDict()
+        self._versions = [0] * self.STRIPES
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, user_id: int) -> int:
+        return self._versions[user_id % self.STRIPES]
+
+    def bump(self, user_id: int) -> None:
+        with self._lock:
+            self._versions[user_id % self.STRIPES] += 1
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        size = value.size(key)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+
+            self._entries[key] = (size, value)
+            self.bytes += size
+
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# ==========================
+# Versioned Cache
+# ==========================
+
+class ResponseCache:
+    """
+    Responses keyed by user, a per-user version and the request variant
+    (query string). Write handlers call `invalidate` after committing,
+    which bumps the version: older entries become unreachable at once
+    and age out of the LRU.
+
+    Take the key before reading the database. A write that lands during
+    the read then bumps past it, so the entry is stored under a version
+    nobody asks for again instead of serving stale data.
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend.max_bytes > 0
+
+    def key(self, user_id: int, variant: str) -> str:
+        return f"{user_id}:{self.backend.version(user_id)}:{variant}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self.backend.get(key)
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        self.backend.set(key, value)
+
+    def invalidate(self, user_id: int) -> None:
+        self.backend.bump(user_id)
+
+
+# Replaced at app startup, sized by TASK_LIST_CACHE_MAX_BYTES
+task_list_cache = ResponseCache(MemoryCacheBackend(max_bytes=0))
+
+
+Counter(
+    "task_list_cache_requests_total",
+    "GET /tasks response cache lookups by result.",
+    ("result",),
+    callback=lambda: {
+        ("hit",): task_list_cache.backend.stats()["hits"],
+        ("miss",): task_list_cache.backend.stats()["misses"],
+    },
+)
+
+Counter(
+    "task_list_cache_evictions_total",
+    "Entries evicted from the GET /tasks response cache to stay in budget.",
+    callback=lambda: task_list_cache.backend.stats()["evictions"],
+)
+
+Gauge(
+    "task_list_cache_bytes",
+    "Bytes held by the GET /tasks response cache.",
+    callback=lambda: task_list_cache.backend.stats()["bytes"],
+)
@@ -0,0 +1,180 @@
+"""
+Access-token revocation without a query per request.
+
+Logouts write token_revocations rows. Every worker mirrors the live
+rows in a Denylist: loaded at startup, then topped up every
+REVOCATION_SYNC_SECONDS with rows revoked since the last sync (minus a
+little slack for commits that landed late). The worker that handled a
+logout adds the entry immediately. Checking a token is two dict
+lookups.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .database import Database
+from .metrics import Gauge
+from .models import TokenRevocationDB
+
+logger = logging.getLogger("app.revocation")
+
+# Re-read this far behind the previous sync: a logout's row can become
+# visible a little after its revoked_at timestamp
+SYNC_SLACK_SECONDS = 60.0
+
+
+def epoch(value: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+# ==========================
+# Denylist
+# ==========================
+
+class Denylist:
+    """
+    Revoked token ids, and per-user cutoffs from "log out everywhere".
+    Entries are dropped once the tokens they cover have expired.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: dict[str, float] = {}                     # jti -> expires
+        self._users: dict[int, tuple[float, float]] = {}        # user -> (cutoff, expires)
+        self._lock = threading.Lock()
+
+        self.synced_at: Optional[float] = None
+
+    def is_revoked(self, jti: Optional[str], user_id: int, issued_at: float) -> bool:
+        # Reads only; writers hold the lock and swap whole entries
+        if jti is not None and jti in self._tokens:
+            return True
+
+        cutoff = self._users.get(user_id)
+        return cutoff is not None and issued_at <= cutoff[0]
+
+    def add(
+        self,
+        user_id: int,
+        jti: Optional[str],
+        revoked_at: float,
+        expires_at: float,
+    ) -> None:
+        with self._lock:
+            if jti is not None:
+                self._tokens[jti] = expires_at
+                return
+
+            cutoff, expires = self._users.get(user_id, (0.0, 0.0))
+            self._users[user_id] = (max(cutoff, revoked_at), max(expires, expires_at))
+
+    def prune(self, now: float) -> None:
+        with self._lock:
+            for jti in [j for j, expires in self._tokens.items() if expires <= now]:
+                del self._tokens[jti]
+
+            for user_id in [u for u, (_, expires) in self._users.items() if expires <= now]:
+                del self._users[user_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self.synced_at = None
+
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._users)
+
+
+denylist = Denylist()
+
+Gauge(
+    "token_denylist_size",
+    "Revoked tokens and user-wide cutoffs held in memory.",
+    callback=lambda: len(denylist),
+)
+
+
+# ==========================
+# Sync
+# ==========================
+
+def sync_denylist(db: Session, target: Denylist = denylist) -> int:
+    """
+    Load revocations newer than the last sync (all live ones the first
+    time) into `target` and prune expired entries. Returns rows read.
+    """
+    started = time.time()
+    now = datetime.utcnow()
+
+    query = select(
+        TokenRevocationDB.user_id,
+        TokenRevocationDB.jti,
+        TokenRevocationDB.revoked_at,
+        TokenRevocationDB.expires_at,
+    ).where(TokenRevocationDB.expires_at > now)
+
+    if target.synced_at is not None:
+        since = datetime.utcfromtimestamp(target.synced_at - SYNC_SLACK_SECONDS)
+        query = query.where(TokenRevocationDB.revoked_at >= since)
+
+    rows = db.execute(query).all()
+
+    for user_id, jti, revoked_at, expires_at in rows:
+        target.add(user_id, jti, epoch(revoked_at), epoch(expires_at))
+
+    target.prune(started)
+    target.synced_at = started
+
+    return len(rows)
+
+
+def purge_revocations(db: Session) -> int:
+    """Delete rows whose tokens have all expired."""
+    purged = db.execute(
+        delete(TokenRevocationDB)
+        .where(TokenRevocationDB.expires_at <= datetime.utcnow())
+    ).rowcount
+    db.commit()
+
+    return purged
+
+
+def _sync(database: Database, purge: bool = False) -> None:
+    with database.SessionLocal() as db:
+        if purge:
+            purge_revocations(db)
+        sync_denylist(db)
+
+
+async def _try_sync(database: Database, purge: bool, action: str) -> None:
+    try:
+        await run_in_threadpool(_sync, database, purge)
+    except DBAPIError as exc:
+        # Unreachable database, or no schema yet (e.g. migrations not
+        # run): one line, and the next sync tries again
+        logger.warning("%s token revocations failed: %s", action, exc.orig)
+    except Exception:
+        logger.exception("%s token revocations failed", action)
+
+
+async def load_denylist(database: Database) -> None:
+    """Startup: purge expired rows and load the rest."""
+    denylist.clear()
+
+    # Keep serving on failure; the periodic sync retries the full load
+    await _try_sync(database, True, "Loading")
+
+
+async def keep_denylist_synced(database: Database, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await _try_sync(database, False, "Syncing")
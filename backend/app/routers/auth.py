@@ -1,40 +1,71 @@
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import delete, insert, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 
-from ..database import get_db
-from ..models import UserDB, RefreshTokenDB
-from ..schemas import UserCreate, UserResponse, Token, TokenPair, RefreshRequest
-from ..security import hash_password, verify_password
+from ..config import settings
+from ..database import DBSession, get_db, run_in_session
+from ..rate_limit import (
+    LOGIN_PER_ACCOUNT,
+    LOGIN_PER_IP,
+    REFRESH_PER_IP,
+    REGISTER_PER_ACCOUNT,
+    REGISTER_PER_IP,
+    limiter,
+)
+from ..models import UserDB, RefreshTokenDB, TokenRevocationDB
+from ..revocation import denylist
+from ..schemas import UserCreate, UserResponse, TokenPair, RefreshRequest
+from ..security import hash_password, hash_pool, verify_and_rehash
 from ..dependencies.auth import (
     create_access_token,
     create_refresh_token,
-    SECRET_KEY,
+    decode_access_token,
+    hash_refresh_token,
+    invalidate_principal,
+    oauth2_scheme,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
     ALGORITHM,
 )
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Argon2 runs on the bounded hash_pool and JWT signing in the
+# threadpool; ORM work runs through run_in_session like in
+# routers/tasks.py. Rate limits are checked first, before any hashing
+# or database work.
+
+
+def _client_ip(http_request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the
+    # real client rather than the proxy
+    return http_request.client.host if http_request.client else "unknown"
+
 
 # =============================
 # REGISTER
 # =============================
 
-@router.post("/register", response_model=UserResponse, status_code=201)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    hashed_pw = hash_password(user.password)
-
+def _create_user(db: Session, email: str, hashed_password: str) -> UserDB:
     db_user = UserDB(
-        email=user.email,
-        hashed_password=hashed_pw,
+        email=email,
+        hashed_password=hashed_password,
     )
 
     try:
         db.add(db_user)
+        db.flush()
+
+        # Like every write below: keep this user's next reads on the
+        # primary (see database.RoutingSession)
+        db.info["user_id"] = db_user.id
         db.commit()
         db.refresh(db_user)
     except IntegrityError:
@@ -47,51 +78,118 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 
+@router.post("/register", response_model=UserResponse, status_code=201)
+async def register(
+    user: UserCreate,
+    http_request: Request,
+    db: DBSession = Depends(get_db),
+):
+    limiter.check(REGISTER_PER_IP, _client_ip(http_request))
+    limiter.check(REGISTER_PER_ACCOUNT, user.email.strip().lower())
+
+    hashed_pw = await hash_pool.submit(hash_password, user.password)
+
+    return await run_in_session(db, _create_user, user.email, hashed_pw)
+
+
 # =============================
 # LOGIN (Returns TokenPair)
 # =============================
 
-@router.post("/login", response_model=TokenPair)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
-):
-    user = db.query(UserDB).filter(
-        UserDB.email == form_data.username
+def _get_user_by_email(db: Session, email: str) -> UserDB | None:
+    return db.query(UserDB).filter(
+        UserDB.email == email
     ).first()
 
-    if not user or not verify_password(
-        form_data.password,
-        user.hashed_password,
-    ):
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
 
+def _issue_tokens(user_id: int) -> tuple[str, str]:
     # Create access token
     access_token = create_access_token(
-        data={"user_id": user.id},
+        data={"user_id": user_id},
         expires_delta=timedelta(minutes=15),
     )
 
     # Create refresh token
     refresh_token = create_refresh_token(
-        data={"user_id": user.id},
+        data={"user_id": user_id},
         expires_delta=timedelta(days=7),
     )
 
-    # Store refresh token in DB
+    return access_token, refresh_token
+
+
+def _store_refresh_token(
+    db: Session,
+    user_id: int,
+    refresh_token: str,
+    rehashed: tuple[str, str] | None = None,
+) -> None:
     db_refresh = RefreshTokenDB(
-        token=refresh_token,
-        user_id=user.id,
+        token_hash=hash_refresh_token(refresh_token),
+        user_id=user_id,
         expires_at=datetime.utcnow() + timedelta(days=7),
     )
 
     db.add(db_refresh)
+
+    # Upgrade a hash made under an older profile, in the same commit.
+    # Matching on the old hash keeps a concurrent password change.
+    if rehashed is not None:
+        old_hash, new_hash = rehashed
+        db.execute(
+            update(UserDB)
+            .where(UserDB.id == user_id, UserDB.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+            .execution_options(synchronize_session=False)
+        )
+
     db.commit()
 
+    if rehashed is not None:
+        invalidate_principal(user_id)
+
+
+@router.post("/login", response_model=TokenPair)
+async def login(
+    http_request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: DBSession = Depends(get_db),
+):
+    limiter.check(LOGIN_PER_IP, _client_ip(http_request))
+    limiter.check(LOGIN_PER_ACCOUNT, form_data.username.strip().lower())
+
+    user = await run_in_session(db, _get_user_by_email, form_data.username)
+
+    valid, new_hash = (
+        await hash_pool.submit(
+            verify_and_rehash,
+            form_data.password,
+            user.hashed_password,
+        )
+        if user else (False, None)
+    )
+
+    if not valid:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token, refresh_token = await run_in_threadpool(
+        _issue_tokens, user.id
+    )
+
+    # Store refresh token in DB
+    db.info["user_id"] = user.id
+    await run_in_session(
+        db,
+        _store_refresh_token,
+        user.id,
+        refresh_token,
+        (user.hashed_password, new_hash) if new_hash else None,
+    )
+
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -103,24 +201,18 @@ def login(
 # REFRESH (Token Rotation)
 # =============================
 
-@router.post("/refresh", response_model=Token)
-def refresh(
-    request: RefreshRequest,
-    db: Session = Depends(get_db),
-):
-    refresh_token = request.refresh_token
-
+def _decode_refresh_token(refresh_token: str) -> int:
     try:
         payload = jwt.decode(
             refresh_token,
-            SECRET_KEY,
+            settings.SECRET_KEY,
             algorithms=[ALGORITHM],
         )
 
         if payload.get("type") != "refresh":
             raise HTTPException(status_code=401)
 
-        user_id = payload.get("user_id")
+        return payload.get("user_id")
 
     except JWTError:
         raise HTTPException(
@@ -128,49 +220,185 @@ def refresh(
             detail="Invalid refresh token",
         )
 
-    stored_token = db.query(RefreshTokenDB).filter(
-        RefreshTokenDB.token == refresh_token
+
+def _rotate_refresh_token(
+    db: Session,
+    refresh_token: str,
+    new_refresh_token: str,
+) -> None:
+    # Claim the old token with a single DELETE ... RETURNING. Of two
+    # concurrent refreshes with the same token only one gets the row
+    # back; the other sees it gone and is rejected.
+    stored_token = db.execute(
+        delete(RefreshTokenDB)
+        .where(RefreshTokenDB.token_hash == hash_refresh_token(refresh_token))
+        .returning(RefreshTokenDB.user_id, RefreshTokenDB.expires_at)
     ).first()
 
     if not stored_token:
+        db.rollback()
         raise HTTPException(
             status_code=401,
             detail="Refresh token not found",
         )
 
     if stored_token.expires_at < datetime.utcnow():
-        db.delete(stored_token)
         db.commit()
         raise HTTPException(
             status_code=401,
             detail="Refresh token expired",
         )
 
-    # Rotate refresh token (delete old)
-    db.delete(stored_token)
-
-    new_refresh_token = create_refresh_token(
-        data={"user_id": user_id},
-        expires_delta=timedelta(days=7),
-    )
-
-    db.add(
-        RefreshTokenDB(
-            token=new_refresh_token,
-            user_id=user_id,
+    db.execute(
+        insert(RefreshTokenDB).values(
+            token_hash=hash_refresh_token(new_refresh_token),
+            user_id=stored_token.user_id,
             expires_at=datetime.utcnow() + timedelta(days=7),
         )
     )
 
-    # Create new access token
-    new_access_token = create_access_token(
-        data={"user_id": user_id},
-        expires_delta=timedelta(minutes=15),
+    db.commit()
+
+
+@router.post("/refresh", response_model=TokenPair)
+async def refresh(
+    request: RefreshRequest,
+    http_request: Request,
+    db: DBSession = Depends(get_db),
+):
+    limiter.check(REFRESH_PER_IP, _client_ip(http_request))
+
+    refresh_token = request.refresh_token
+
+    user_id = await run_in_threadpool(_decode_refresh_token, refresh_token)
+    db.info["user_id"] = user_id
+
+    # Create new access + refresh token
+    new_access_token, new_refresh_token = await run_in_threadpool(
+        _issue_tokens, user_id
     )
 
-    db.commit()
+    await run_in_session(
+        db,
+        _rotate_refresh_token,
+        refresh_token,
+        new_refresh_token,
+    )
 
+    # The old refresh token is gone, so the client needs the new one
     return {
         "access_token": new_access_token,
+        "refresh_token": new_refresh_token,
         "token_type": "bearer",
     }
+
+
+# =============================
+# LOGOUT (Revocation)
+# =============================
+
+# Revocations are written to token_revocations and added to this
+# worker's denylist straight away; other workers pick them up on their
+# next sync (see app/revocation.py). Rows are kept until the tokens
+# they cover would have expired anyway.
+
+def _revoke_token(
+    db: Session,
+    user_id: int,
+    jti: Optional[str],
+    expires_at: datetime,
+    refresh_token: Optional[str],
+) -> None:
+    # Tokens issued before jti existed can't be named; they only lose
+    # their refresh token and run out within ACCESS_TOKEN_EXPIRE_MINUTES
+    if jti is not None:
+        db.execute(
+            insert(TokenRevocationDB).values(
+                user_id=user_id,
+                jti=jti,
+                revoked_at=datetime.utcnow(),
+                expires_at=expires_at,
+            )
+        )
+
+    if refresh_token is not None:
+        db.execute(
+            delete(RefreshTokenDB)
+            .where(
+                RefreshTokenDB.token_hash == hash_refresh_token(refresh_token),
+                RefreshTokenDB.user_id == user_id,
+            )
+        )
+
+    db.commit()
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    db: DBSession = Depends(get_db),
+):
+    """Revoke this access token and, if given, its refresh token."""
+    payload = decode_access_token(token)
+    user_id = payload["user_id"]
+    jti = payload.get("jti")
+    expires_at = float(payload["exp"])
+
+    db.info["user_id"] = user_id
+    await run_in_session(
+        db,
+        _revoke_token,
+        user_id,
+        jti,
+        datetime.utcfromtimestamp(expires_at),
+        request.refresh_token if request else None,
+    )
+
+    if jti is not None:
+        denylist.add(user_id, jti, time.time(), expires_at)
+
+    return None
+
+
+def _revoke_all_tokens(db: Session, user_id: int, cutoff: float) -> None:
+    revoked_at = datetime.utcfromtimestamp(cutoff)
+
+    db.execute(
+        delete(RefreshTokenDB).where(RefreshTokenDB.user_id == user_id)
+    )
+
+    # jti NULL: every access token issued up to revoked_at. Those last
+    # ACCESS_TOKEN_EXPIRE_MINUTES at most, and so does the row.
+    db.execute(
+        insert(TokenRevocationDB).values(
+            user_id=user_id,
+            jti=None,
+            revoked_at=revoked_at,
+            expires_at=revoked_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        )
+    )
+
+    db.commit()
+
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all(
+    token: str = Depends(oauth2_scheme),
+    db: DBSession = Depends(get_db),
+):
+    """Revoke every access and refresh token issued to this user so far."""
+    user_id = decode_access_token(token)["user_id"]
+    cutoff = time.time()
+
+    db.info["user_id"] = user_id
+    await run_in_session(db, _revoke_all_tokens, user_id, cutoff)
+
+    denylist.add(
+        user_id,
+        None,
+        cutoff,
+        cutoff + ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+    return None
@@ -0,0 +1,94 @@
+import asyncio
+
+from fastapi import APIRouter, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from ..database import Database
+
+router = APIRouter(tags=["Health"])
+
+# Give up on the readiness ping well before a load balancer would
+READY_TIMEOUT_SECONDS = 2.0
+
+
+# ==========================
+# LIVENESS
+# ==========================
+
+@router.get("/healthz")
+async def healthz():
+    # The process and its event loop are alive; nothing else is checked
+    return {"status": "ok"}
+
+
+# ==========================
+# READINESS
+# ==========================
+
+def _pool_report(options: dict, pool) -> dict:
+    capacity = options["pool_size"] + options["max_overflow"]
+    checked_out = pool.checkedout()
+
+    return {
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "capacity": capacity,
+        "saturated": checked_out >= capacity,
+    }
+
+
+def _ping_sync(database: Database) -> None:
+    with database.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _ping(database: Database) -> None:
+    if database.async_engine is not None:
+        async with database.async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return
+
+    await run_in_threadpool(_ping_sync, database)
+
+
+@router.get("/readyz")
+async def readyz(request: Request, response: Response):
+    """
+    Ready when the pool serving requests has a free connection and the
+    database answers a ping. An exhausted pool is reported without
+    pinging, since the ping would queue behind everyone else.
+    """
+    database: Database = request.app.state.database
+
+    pools = {"primary": _pool_report(database.sync_options, database.engine.pool)}
+    serving = "primary"
+
+    if database.async_engine is not None:
+        pools["async"] = _pool_report(database.options, database.async_engine.pool)
+        serving = "async"
+
+    # Replicas are reported but don't decide readiness: reads fall back
+    # to the primary while they're ejected
+    for replica in database.replicas:
+        pools[replica.name] = {
+            **_pool_report(database.options, replica.bind.pool),
+            "ejected": replica.ejected,
+        }
+
+    report = {"status": "ok", "database": "ok", "pools": pools}
+
+    if pools[serving]["saturated"]:
+        report["status"] = report["database"] = "pool exhausted"
+    else:
+        try:
+            await asyncio.wait_for(_ping(database), READY_TIMEOUT_SECONDS)
+        except Exception as exc:
+            report["status"] = "unavailable"
+            report["database"] = type(exc).__name__
+
+    if report["status"] != "ok":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return report
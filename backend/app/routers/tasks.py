@@ -1,10 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import csv
+import io
+import json
+import re
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import (
+    case,
+    column,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    table,
+    tuple_,
+    update,
+)
 
-from ..database import get_db
-from ..models import TaskDB, UserDB
-from ..schemas import TaskCreate, TaskUpdate, TaskResponse
+from ..config import settings
+from ..database import (
+    DBSession,
+    get_db,
+    reads_from_primary,
+    release_session,
+    run_in_session,
+    stream_partitions,
+)
+from ..etag import etag_matches, make_etag
+from ..events import TaskEvent, broadcaster, event_stream
+from ..models import TaskCounterDB, TaskDB, TaskTombstoneDB, UserDB
+from ..response_cache import CachedResponse, task_list_cache
+from ..pagination import (
+    decode_cursor,
+    decode_sync_token,
+    encode_cursor,
+    encode_sync_token,
+)
+from ..serializers import task_json, task_list_json, task_ndjson
+from ..schemas import (
+    TaskCreate,
+    TaskUpdate,
+    TaskResponse,
+    TaskBatchCreate,
+    TaskBatchUpdate,
+    TaskBatchDelete,
+    TaskBatchResponse,
+    TaskChanges,
+    TaskStats,
+)
 from ..dependencies.auth import get_current_user
 
 
@@ -13,26 +59,134 @@ router = APIRouter(
     tags=["Tasks"],
 )
 
+# Handlers are async; their ORM work lives in the sync `_...` helper
+# next to each one and runs through run_in_session, which works for
+# both the sync and the async engine.
+
 
 # ==========================
-# CREATE TASK
+# CHANGE VERSION (ETags, changes feed)
 # ==========================
 
-@router.post(
-    "",
-    response_model=TaskResponse,
-    status_code=status.HTTP_201_CREATED,
-)
-def create_task(
-    task: TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+# Every write first bumps users.tasks_version in its own transaction
+# and stamps what it touches with the new value (tasks.changed_version,
+# task_tombstones.version). Conditional reads answer 304 from that one
+# integer, and GET /tasks/changes reads deltas by it. Bumping first
+# also takes the user's row lock before any task rows, in every path.
+
+def _bump_tasks_version(db: Session, user_id: int) -> int:
+    return db.execute(
+        update(UserDB)
+        .where(UserDB.id == user_id)
+        .values(tasks_version=UserDB.tasks_version + 1)
+        .returning(UserDB.tasks_version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def _record_tombstones(
+    db: Session,
+    user_id: int,
+    task_ids,
+    version: int,
+) -> None:
+    db.execute(
+        insert(TaskTombstoneDB),
+        [
+            {"user_id": user_id, "task_id": task_id, "version": version}
+            for task_id in task_ids
+        ],
+    )
+
+    # The changes feed never reaches back more than CHANGES_MAX versions,
+    # so older tombstones can't be served again
+    if version > CHANGES_MAX:
+        db.execute(
+            delete(TaskTombstoneDB)
+            .where(
+                TaskTombstoneDB.user_id == user_id,
+                TaskTombstoneDB.version <= version - CHANGES_MAX,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _load_if_modified(
+    db: Session,
+    user_id: int,
+    if_none_match: str | None,
+    variant: str,
+    loader,
+    *args,
 ):
+    """
+    Returns (etag, None) when the client's copy is current, else
+    (etag, loader(db, *args)). The version is read before the data, so
+    a concurrent write can only make the tag look older, never newer.
+    """
+    version = db.execute(
+        select(UserDB.tasks_version).where(UserDB.id == user_id)
+    ).scalar_one()
+
+    etag = make_etag(user_id, version, variant)
+
+    if etag_matches(if_none_match, etag):
+        return etag, None
+
+    return etag, loader(db, *args)
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+
+
+def _set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+# ==========================
+# FAST SERIALIZATION
+# ==========================
+
+# With FAST_TASK_SERIALIZATION on, reads select TASK_COLUMNS rows and
+# return pre-encoded JSON, bypassing response_model validation.
+
+def _json_response(response: Response, content: bytes) -> Response:
+    # A returned Response replaces the injected one; keep its headers
+    return Response(
+        content,
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
+
+
+def _cached_response(cached: CachedResponse) -> Response:
+    response = Response(cached.body, media_type="application/json")
+    _set_etag(response, cached.etag)
+
+    if cached.next_cursor is not None:
+        response.headers["X-Next-Cursor"] = cached.next_cursor
+
+    return response
+
+
+# ==========================
+# CREATE TASK
+# ==========================
+
+def _create_task(db: Session, user_id: int, task: TaskCreate) -> TaskDB:
+    version = _bump_tasks_version(db, user_id)
+
     db_task = TaskDB(
         title=task.title,
         priority=task.priority,
         completed=False,
-        user_id=current_user.id,
+        user_id=user_id,
+        changed_version=version,
     )
 
     db.add(db_task)
@@ -42,58 +196,745 @@ def create_task(
     return db_task
 
 
+@router.post(
+    "",
+    response_model=TaskResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_task(
+    task: TaskCreate,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    db_task = await run_in_session(db, _create_task, current_user.id, task)
+    task_list_cache.invalidate(current_user.id)
+    await broadcaster.publish(current_user.id, _task_events("created", [db_task]))
+
+    return db_task
+
+
+# ==========================
+# BATCH CREATE / UPDATE / DELETE
+# ==========================
+
+# Columns returned by the batch statements (RETURNING)
+TASK_COLUMNS = (
+    TaskDB.id,
+    TaskDB.title,
+    TaskDB.priority,
+    TaskDB.completed,
+)
+
+
+def _create_tasks_batch(
+    db: Session,
+    user_id: int,
+    items: list[TaskCreate],
+) -> list:
+    version = _bump_tasks_version(db, user_id)
+
+    rows = db.execute(
+        insert(TaskDB).returning(*TASK_COLUMNS, sort_by_parameter_order=True),
+        [
+            {
+                "title": item.title,
+                "priority": item.priority,
+                "completed": False,
+                "user_id": user_id,
+                "changed_version": version,
+            }
+            for item in items
+        ],
+    ).all()
+
+    db.commit()
+
+    return rows
+
+
+@router.post(
+    "/batch",
+    response_model=TaskBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_tasks_batch(
+    batch: TaskBatchCreate,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    if not batch.items:
+        return {"results": []}
+
+    rows = await run_in_session(
+        db, _create_tasks_batch, current_user.id, batch.items
+    )
+    task_list_cache.invalidate(current_user.id)
+    await broadcaster.publish(current_user.id, _task_events("created", rows))
+
+    return {
+        "results": [
+            {"id": row.id, "status": status.HTTP_201_CREATED, "task": row}
+            for row in rows
+        ]
+    }
+
+
+def _update_tasks_batch(
+    db: Session,
+    user_id: int,
+    ids: list[int],
+    changes: dict[int, dict],
+) -> dict:
+    # One CASE per touched column lets every item carry its own values
+    # while still running as a single UPDATE.
+    values = {}
+    for field in ("title", "priority", "completed"):
+        whens = {
+            task_id: change[field]
+            for task_id, change in changes.items()
+            if field in change
+        }
+
+        if whens:
+            values[field] = case(
+                whens,
+                value=TaskDB.id,
+                else_=getattr(TaskDB, field),
+            )
+
+    # Items that only name an id are read back, not rewritten, so they
+    # keep their changed_version and stay out of /tasks/changes
+    changed = [task_id for task_id in ids if changes[task_id]]
+    unchanged = [task_id for task_id in ids if not changes[task_id]]
+    found = {}
+    updated = False
+
+    if values:
+        values["changed_version"] = _bump_tasks_version(db, user_id)
+        found.update(
+            (row.id, row)
+            for row in db.execute(
+                update(TaskDB)
+                .where(TaskDB.id.in_(changed), TaskDB.user_id == user_id)
+                .values(**values)
+                .returning(*TASK_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+        )
+        updated = bool(found)
+
+    if unchanged:
+        found.update(
+            (row.id, row)
+            for row in db.execute(
+                select(*TASK_COLUMNS)
+                .where(TaskDB.id.in_(unchanged), TaskDB.user_id == user_id)
+            )
+        )
+
+    if values and not updated:
+        db.rollback()   # Nothing matched: undo the bump
+    else:
+        db.commit()
+
+    return found
+
+
+@router.patch(
+    "/batch",
+    response_model=TaskBatchResponse,
+)
+async def update_tasks_batch(
+    batch: TaskBatchUpdate,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    if not batch.items:
+        return {"results": []}
+
+    ids = [item.id for item in batch.items]
+    changes = {
+        item.id: item.model_dump(exclude_unset=True, exclude={"id"})
+        for item in batch.items
+    }
+
+    found = await run_in_session(
+        db, _update_tasks_batch, current_user.id, ids, changes
+    )
+    task_list_cache.invalidate(current_user.id)
+    await broadcaster.publish(
+        current_user.id,
+        _task_events(
+            "updated",
+            [row for task_id, row in found.items() if changes[task_id]],
+        ),
+    )
+
+    return {
+        "results": [
+            {"id": task_id, "status": status.HTTP_200_OK, "task": found[task_id]}
+            if task_id in found
+            else {"id": task_id, "status": status.HTTP_404_NOT_FOUND}
+            for task_id in ids
+        ]
+    }
+
+
+def _delete_tasks_batch(db: Session, user_id: int, ids: list[int]) -> set[int]:
+    version = _bump_tasks_version(db, user_id)
+
+    deleted = set(
+        db.execute(
+            delete(TaskDB)
+            .where(
+                TaskDB.id.in_(ids),
+                TaskDB.user_id == user_id,
+            )
+            .returning(TaskDB.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+    )
+
+    if deleted:
+        _record_tombstones(db, user_id, deleted, version)
+        db.commit()
+    else:
+        db.rollback()   # Nothing matched: undo the bump
+
+    return deleted
+
+
+@router.delete(
+    "/batch",
+    response_model=TaskBatchResponse,
+)
+async def delete_tasks_batch(
+    batch: TaskBatchDelete,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    if not batch.ids:
+        return {"results": []}
+
+    deleted = await run_in_session(
+        db, _delete_tasks_batch, current_user.id, batch.ids
+    )
+    task_list_cache.invalidate(current_user.id)
+    await broadcaster.publish(current_user.id, _deleted_events(deleted))
+
+    return {
+        "results": [
+            {
+                "id": task_id,
+                "status": status.HTTP_204_NO_CONTENT
+                if task_id in deleted
+                else status.HTTP_404_NOT_FOUND,
+            }
+            for task_id in batch.ids
+        ]
+    }
+
+
 # ==========================
 # GET TASKS (Pagination + Filtering + Sorting)
 # ==========================
 
+def _get_tasks(
+    db: Session,
+    user_id: int,
+    skip: int,
+    limit: int,
+    seek_key: tuple[int, int] | None,
+    completed: bool | None,
+    sort_by_priority_desc: bool,
+    as_rows: bool = False,
+) -> list[TaskDB]:
+    query = db.query(*TASK_COLUMNS) if as_rows else db.query(TaskDB)
+    query = query.filter(
+        TaskDB.user_id == user_id
+    )
+
+    # Filtering
+    if completed is not None:
+        query = query.filter(TaskDB.completed == completed)
+
+    # Sorting (id breaks priority ties so pages never overlap)
+    if sort_by_priority_desc:
+        query = query.order_by(TaskDB.priority.desc(), TaskDB.id.desc())
+    else:
+        query = query.order_by(TaskDB.priority.asc(), TaskDB.id.asc())
+
+    # Pagination: seek past the cursor, or fall back to offset
+    if seek_key is not None:
+        sort_key = tuple_(TaskDB.priority, TaskDB.id)
+
+        if sort_by_priority_desc:
+            query = query.filter(sort_key < tuple_(*seek_key))
+        else:
+            query = query.filter(sort_key > tuple_(*seek_key))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit).all()
+
+
 @router.get(
     "",
     response_model=list[TaskResponse],
 )
-def get_tasks(
+async def get_tasks(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
     completed: bool | None = None,
     sort_by_priority_desc: bool = True,
-    db: Session = Depends(get_db),
+    if_none_match: str | None = Header(None),
+    db: DBSession = Depends(get_db),
     current_user: UserDB = Depends(get_current_user),
 ):
-    query = db.query(TaskDB).filter(
-        TaskDB.user_id == current_user.id
+    seek_key = None
+
+    if cursor is not None:
+        if skip:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use either skip or cursor, not both",
+            )
+
+        try:
+            seek_key = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+
+    # Keyed before the read (see ResponseCache). Replica reads may lag
+    # the version, so only primary reads are cached.
+    cache_key = None
+
+    if task_list_cache.enabled and "replica" not in db.info:
+        cache_key = task_list_cache.key(current_user.id, request.url.query)
+        cached = task_list_cache.get(cache_key)
+
+        if cached is not None:
+            if etag_matches(if_none_match, cached.etag):
+                return _not_modified(cached.etag)
+            return _cached_response(cached)
+
+    etag, tasks = await run_in_session(
+        db,
+        _load_if_modified,
+        current_user.id,
+        if_none_match,
+        request.url.query,
+        _get_tasks,
+        current_user.id,
+        skip,
+        limit,
+        seek_key,
+        completed,
+        sort_by_priority_desc,
+        settings.FAST_TASK_SERIALIZATION or cache_key is not None,
     )
 
-    # Filtering
-    if completed is not None:
-        query = query.filter(TaskDB.completed == completed)
+    if tasks is None:
+        return _not_modified(etag)
 
-    # Sorting
-    if sort_by_priority_desc:
-        query = query.order_by(TaskDB.priority.desc())
+    _set_etag(response, etag)
+
+    # A full page may have more behind it
+    next_cursor = None
+    if len(tasks) == limit:
+        last = tasks[-1]
+        next_cursor = encode_cursor(last.priority, last.id)
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    if cache_key is not None:
+        body = task_list_json(tasks)
+        task_list_cache.set(cache_key, CachedResponse(body, etag, next_cursor))
+        return _json_response(response, body)
+
+    if settings.FAST_TASK_SERIALIZATION:
+        return _json_response(response, task_list_json(tasks))
+
+    return tasks
+
+
+# ==========================
+# SEARCH TASKS (Full-text on titles)
+# ==========================
+
+# Terms are word characters only, so they can't inject query syntax
+SEARCH_MAX_TERMS = 8
+
+# Must match the expression in ix_tasks_title_search (see models.py)
+SEARCH_CONFIG = literal_column("'simple'")
+
+tasks_fts = table("tasks_fts", column("rowid"), column("title"), column("rank"))
+
+
+def _search_terms(q: str) -> list[str]:
+    return re.findall(r"\w+", q.lower())[:SEARCH_MAX_TERMS]
+
+
+def _search_tasks(
+    db: Session,
+    user_id: int,
+    terms: list[str],
+    skip: int,
+    limit: int,
+) -> list[TaskDB]:
+    # Every term must match as a word prefix; best matches first
+    stmt = select(TaskDB).where(TaskDB.user_id == user_id)
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        vector = func.to_tsvector(SEARCH_CONFIG, TaskDB.title)
+        query = func.to_tsquery(
+            SEARCH_CONFIG,
+            " & ".join(f"{term}:*" for term in terms),
+        )
+        stmt = stmt.where(vector.op("@@")(query)).order_by(
+            func.ts_rank(vector, query).desc(),
+            TaskDB.id,
+        )
+    elif dialect == "sqlite":
+        stmt = (
+            stmt.join(tasks_fts, tasks_fts.c.rowid == TaskDB.id)
+            .where(tasks_fts.c.title.match(
+                " ".join(f'"{term}"*' for term in terms)
+            ))
+            .order_by(tasks_fts.c.rank, TaskDB.id)
+        )
     else:
-        query = query.order_by(TaskDB.priority.asc())
+        for term in terms:
+            stmt = stmt.where(TaskDB.title.ilike(f"%{term}%"))
+        stmt = stmt.order_by(TaskDB.id)
+
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
 
-    # Pagination
-    tasks = query.offset(skip).limit(limit).all()
+
+@router.get(
+    "/search",
+    response_model=list[TaskResponse],
+)
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    if_none_match: str | None = Header(None),
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    terms = _search_terms(q)
+
+    if not terms:
+        return []
+
+    etag, tasks = await run_in_session(
+        db,
+        _load_if_modified,
+        current_user.id,
+        if_none_match,
+        f"search?{request.url.query}",
+        _search_tasks,
+        current_user.id,
+        terms,
+        skip,
+        limit,
+    )
+
+    if tasks is None:
+        return _not_modified(etag)
+
+    _set_etag(response, etag)
 
     return tasks
 
 
 # ==========================
-# GET SINGLE TASK
+# TASK STATS
 # ==========================
 
+# task_counters is kept current by triggers on tasks (see models.py)
+
+def _get_task_counters(db: Session, user_id: int) -> list[tuple[int, int, int]]:
+    return db.execute(
+        select(
+            TaskCounterDB.priority,
+            TaskCounterDB.total,
+            TaskCounterDB.completed,
+        )
+        .where(TaskCounterDB.user_id == user_id)
+        .order_by(TaskCounterDB.priority)
+    ).all()
+
+
 @router.get(
-    "/{task_id}",
-    response_model=TaskResponse,
+    "/stats",
+    response_model=TaskStats,
 )
-def get_task(
-    task_id: int,
-    db: Session = Depends(get_db),
+async def get_task_stats(
+    db: DBSession = Depends(get_db),
     current_user: UserDB = Depends(get_current_user),
 ):
-    db_task = db.query(TaskDB).filter(
+    rows = await run_in_session(db, _get_task_counters, current_user.id)
+
+    by_priority = [
+        {
+            "priority": priority,
+            "total": total,
+            "completed": completed,
+            "open": total - completed,
+        }
+        for priority, total, completed in rows
+    ]
+
+    total = sum(row["total"] for row in by_priority)
+    completed = sum(row["completed"] for row in by_priority)
+
+    return {
+        "total": total,
+        "completed": completed,
+        "open": total - completed,
+        "by_priority": by_priority,
+    }
+
+
+# ==========================
+# CHANGES FEED (Incremental Sync)
+# ==========================
+
+# A client keeps a local copy: it asks for a token (no `since`), loads
+# GET /tasks, then polls with the last token it got. Every write after
+# the token is replayed; applying them as upserts/deletes converges.
+# Past CHANGES_MAX changes, or a token more than CHANGES_MAX versions
+# old (older tombstones are pruned), a full reload is cheaper: 410.
+
+CHANGES_MAX = 1000
+
+
+def _get_changes(
+    db: Session,
+    user_id: int,
+    since: int | None,
+) -> tuple[int, list, list[int]]:
+    # Versions up to the current one are all committed, so nothing at
+    # or below it can show up after this read.
+    version = db.execute(
+        select(UserDB.tasks_version).where(UserDB.id == user_id)
+    ).scalar_one()
+
+    if since is not None and since > version:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Sync token is ahead of the server, reload tasks",
+        )
+
+    if since is None or since == version:
+        return version, [], []
+
+    if since < version - CHANGES_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Too many changes since this token, reload tasks",
+        )
+
+    changed = db.execute(
+        select(*TASK_COLUMNS)
+        .where(TaskDB.user_id == user_id, TaskDB.changed_version > since)
+        .order_by(TaskDB.changed_version, TaskDB.id)
+        .limit(CHANGES_MAX + 1)
+    ).all()
+
+    deleted = db.execute(
+        select(TaskTombstoneDB.task_id)
+        .where(
+            TaskTombstoneDB.user_id == user_id,
+            TaskTombstoneDB.version > since,
+        )
+        .limit(CHANGES_MAX + 1)
+    ).scalars().all()
+
+    if len(changed) > CHANGES_MAX or len(deleted) > CHANGES_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Too many changes since this token, reload tasks",
+        )
+
+    # An id can come back (SQLite reuses the highest rowid); a row that
+    # exists now was written after its tombstone.
+    live = {row.id for row in changed}
+
+    return version, changed, sorted(set(deleted) - live)
+
+
+@router.get(
+    "/changes",
+    response_model=TaskChanges,
+)
+# A lagging replica would hand out tokens behind ones already issued
+@reads_from_primary
+async def get_task_changes(
+    since: str | None = None,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    since_version = None
+
+    if since is not None:
+        try:
+            token_user_id, since_version = decode_sync_token(since)
+        except ValueError:
+            token_user_id = None
+
+        if token_user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid sync token",
+            )
+
+    version, changed, deleted = await run_in_session(
+        db, _get_changes, current_user.id, since_version
+    )
+
+    return {
+        "changes": changed,
+        "deleted": deleted,
+        "next": encode_sync_token(current_user.id, version),
+    }
+
+
+# ==========================
+# LIVE EVENTS (Server-Sent Events)
+# ==========================
+
+# Write handlers publish after their transaction commits. The event
+# generators are lazy, so nothing is built when nobody is listening.
+
+def _task_events(kind: str, tasks):
+    return (
+        TaskEvent(
+            kind,
+            task.id,
+            {
+                "title": task.title,
+                "priority": task.priority,
+                "id": task.id,
+                "completed": task.completed,
+            },
+        )
+        for task in tasks
+    )
+
+
+def _deleted_events(task_ids):
+    return (TaskEvent("deleted", task_id) for task_id in task_ids)
+
+
+@router.get("/stream")
+async def stream_tasks(
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    # Don't hold a pooled connection for the life of the stream
+    await release_session(db)
+
+    subscription = broadcaster.subscribe(current_user.id)
+
+    return StreamingResponse(
+        event_stream(subscription, settings.SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",      # nginx: don't buffer events
+        },
+    )
+
+
+# ==========================
+# EXPORT TASKS (Streaming NDJSON / CSV)
+# ==========================
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return "".join(
+        json.dumps({
+            "id": row.id,
+            "title": row.title,
+            "priority": row.priority,
+            "completed": row.completed,
+        }) + "\n"
+        for row in rows
+    ).encode()
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def _export_stream(db: DBSession, user_id: int, export_format: str):
+    stmt = (
+        select(*TASK_COLUMNS)
+        .where(TaskDB.user_id == user_id)
+        .order_by(TaskDB.id)
+    )
+
+    if export_format == "csv":
+        yield _csv_chunk([[column.key for column in TASK_COLUMNS]])
+        encode = _csv_chunk
+    elif settings.FAST_TASK_SERIALIZATION:
+        encode = task_ndjson
+    else:
+        encode = _ndjson_chunk
+
+    async for rows in stream_partitions(db, stmt, EXPORT_BATCH_SIZE):
+        yield encode(rows)
+
+
+@router.get("/export")
+async def export_tasks(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    return StreamingResponse(
+        _export_stream(db, current_user.id, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="tasks.{export_format}"',
+        },
+    )
+
+
+# ==========================
+# GET SINGLE TASK
+# ==========================
+
+def _get_owned_task(
+    db: Session,
+    user_id: int,
+    task_id: int,
+    as_row: bool = False,
+) -> TaskDB:
+    query = db.query(*TASK_COLUMNS) if as_row else db.query(TaskDB)
+    db_task = query.filter(
         TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id,
+        TaskDB.user_id == user_id,
     ).first()
 
     if not db_task:
@@ -105,38 +946,109 @@ def get_task(
     return db_task
 
 
-# ==========================
-# UPDATE TASK
-# ==========================
-
-@router.put(
+@router.get(
     "/{task_id}",
     response_model=TaskResponse,
 )
-def update_task(
+async def get_task(
     task_id: int,
-    task: TaskUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: DBSession = Depends(get_db),
     current_user: UserDB = Depends(get_current_user),
 ):
-    db_task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id,
-    ).first()
+    # Any delete bumps the version, so a matching tag implies the task
+    # still exists and is unchanged.
+    etag, db_task = await run_in_session(
+        db,
+        _load_if_modified,
+        current_user.id,
+        if_none_match,
+        str(task_id),
+        _get_owned_task,
+        current_user.id,
+        task_id,
+        settings.FAST_TASK_SERIALIZATION,
+    )
 
-    if not db_task:
+    if db_task is None:
+        return _not_modified(etag)
+
+    _set_etag(response, etag)
+
+    if settings.FAST_TASK_SERIALIZATION:
+        return _json_response(response, task_json(db_task))
+
+    return db_task
+
+
+# ==========================
+# UPDATE TASK (PUT / PATCH)
+# ==========================
+
+def _update_task(
+    db: Session,
+    user_id: int,
+    task_id: int,
+    update_data: dict,
+):
+    # One UPDATE ... RETURNING both checks ownership and reads the
+    # result back; the version bump is the only other statement.
+    scope = (TaskDB.id == task_id, TaskDB.user_id == user_id)
+
+    if update_data:
+        version = _bump_tasks_version(db, user_id)
+        stmt = (
+            update(TaskDB)
+            .where(*scope)
+            .values(**update_data, changed_version=version)
+            .returning(*TASK_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        stmt = select(*TASK_COLUMNS).where(*scope)
+
+    db_task = db.execute(stmt).first()
+
+    if db_task is None:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found",
         )
 
+    if update_data:
+        db.commit()
+
+    return db_task
+
+
+@router.put(
+    "/{task_id}",
+    response_model=TaskResponse,
+)
+@router.patch(
+    "/{task_id}",
+    response_model=TaskResponse,
+)
+async def update_task(
+    task_id: int,
+    task: TaskUpdate,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    # Partial update: only the fields present in the body change
     update_data = task.model_dump(exclude_unset=True)
 
-    for key, value in update_data.items():
-        setattr(db_task, key, value)
+    db_task = await run_in_session(
+        db, _update_task, current_user.id, task_id, update_data
+    )
+    task_list_cache.invalidate(current_user.id)
 
-    db.commit()
-    db.refresh(db_task)
+    if update_data:
+        await broadcaster.publish(
+            current_user.id, _task_events("updated", [db_task])
+        )
 
     return db_task
 
@@ -145,27 +1057,38 @@ def update_task(
 # DELETE TASK
 # ==========================
 
-@router.delete(
-    "/{task_id}",
-    status_code=status.HTTP_204_NO_CONTENT,
-)
-def delete_task(
-    task_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
-):
-    db_task = db.query(TaskDB).filter(
-        TaskDB.id == task_id,
-        TaskDB.user_id == current_user.id,
+def _delete_task(db: Session, user_id: int, task_id: int) -> None:
+    version = _bump_tasks_version(db, user_id)
+
+    deleted = db.execute(
+        delete(TaskDB)
+        .where(TaskDB.id == task_id, TaskDB.user_id == user_id)
+        .returning(TaskDB.id)
+        .execution_options(synchronize_session=False)
     ).first()
 
-    if not db_task:
+    if deleted is None:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found",
         )
 
-    db.delete(db_task)
+    _record_tombstones(db, user_id, [task_id], version)
     db.commit()
 
+
+@router.delete(
+    "/{task_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_task(
+    task_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: UserDB = Depends(get_current_user),
+):
+    await run_in_session(db, _delete_task, current_user.id, task_id)
+    task_list_cache.invalidate(current_user.id)
+    await broadcaster.publish(current_user.id, _deleted_events([task_id]))
+
     return None
@@ -1,5 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from collections import Counter
+from pydantic import AfterValidator, BaseModel, BeforeValidator, EmailStr
+from typing import Annotated, Optional
+
+from .config import settings
 
 
 # =============================
@@ -29,6 +32,95 @@ class TaskResponse(Task):
         from_attributes = True
 
 
+# =============================
+# BATCH TASK SCHEMAS
+# =============================
+
+def _within_batch_limit(items):
+    # Runs before the items are validated, so an oversized batch is
+    # rejected without building a model per item
+    if isinstance(items, list) and len(items) > settings.TASK_BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {settings.TASK_BATCH_MAX_ITEMS} items per batch")
+
+    return items
+
+
+def _unique(ids):
+    duplicates = sorted(task_id for task_id, count in Counter(ids).items() if count > 1)
+
+    if duplicates:
+        raise ValueError(f"Duplicate task ids: {duplicates}")
+
+    return ids
+
+
+def _unique_ids(items):
+    _unique(item.id for item in items)
+    return items
+
+
+class TaskBatchCreate(BaseModel):
+    items: Annotated[list[TaskCreate], BeforeValidator(_within_batch_limit)]
+
+
+class TaskBatchUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBatchUpdate(BaseModel):
+    items: Annotated[
+        list[TaskBatchUpdateItem],
+        BeforeValidator(_within_batch_limit),
+        AfterValidator(_unique_ids),
+    ]
+
+
+class TaskBatchDelete(BaseModel):
+    ids: Annotated[
+        list[int],
+        BeforeValidator(_within_batch_limit),
+        AfterValidator(_unique),
+    ]
+
+
+class TaskBatchItemResult(BaseModel):
+    id: int
+    status: int
+    task: Optional[TaskResponse] = None
+
+
+class TaskBatchResponse(BaseModel):
+    results: list[TaskBatchItemResult]
+
+
+# =============================
+# TASK CHANGES SCHEMAS
+# =============================
+
+class TaskChanges(BaseModel):
+    changes: list[TaskResponse]     # created or updated since the token
+    deleted: list[int]              # ids deleted since the token
+    next: str                       # token to pass as `since` next time
+
+
+# =============================
+# TASK STATS SCHEMAS
+# =============================
+
+class TaskCounts(BaseModel):
+    total: int
+    completed: int
+    open: int
+
+
+class TaskPriorityCounts(TaskCounts):
+    priority: int
+
+
+class TaskStats(TaskCounts):
+    by_priority: list[TaskPriorityCounts]
+
+
 # =============================
 # USER SCHEMAS
 # =============================
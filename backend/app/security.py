@@ -1,18 +1,83 @@
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from passlib.context import CryptContext
-from typing import Final
+from typing import Any, Callable, Final, Optional, TypeVar
+
+from .config import Settings, get_settings
+from .metrics import (
+    Gauge,
+    PASSWORD_HASH_DURATION,
+    PASSWORD_HASH_QUEUE_WAIT,
+    PASSWORD_HASH_REJECTED,
+)
+
+T = TypeVar("T")
 
 # ==========================
-# Password Hashing Config
+# Password Hashing Profiles
 # ==========================
 
-# Argon2 parameters tuned for modern systems
-pwd_context: Final = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto",
-    argon2__memory_cost=102400,   # 100 MB
-    argon2__time_cost=2,          # Iterations
-    argon2__parallelism=8,        # Threads
-)
+@dataclass(frozen=True)
+class HashProfile:
+    memory_cost: int        # KiB per hash
+    time_cost: int          # Iterations
+    parallelism: int        # Lanes (threads)
+
+    def context(self) -> CryptContext:
+        return CryptContext(
+            schemes=["argon2"],
+            deprecated="auto",
+            argon2__memory_cost=self.memory_cost,
+            argon2__time_cost=self.time_cost,
+            argon2__parallelism=self.parallelism,
+        )
+
+
+# Selected with PASSWORD_HASH_PROFILE. Hashes made under another profile
+# still verify and are upgraded (or downgraded) on the next login.
+HASH_PROFILES: Final[dict[str, HashProfile]] = {
+    # The original parameters: ~100 MB per hash
+    "strong": HashProfile(memory_cost=102400, time_cost=2, parallelism=8),
+    # OWASP's recommended Argon2id configurations
+    "balanced": HashProfile(memory_cost=47104, time_cost=1, parallelism=1),
+    "compact": HashProfile(memory_cost=19456, time_cost=2, parallelism=1),
+}
+
+
+def hash_profile(settings: Settings) -> HashProfile:
+    """The profile named by settings; "custom" uses PASSWORD_HASH_* values."""
+    if settings.PASSWORD_HASH_PROFILE == "custom":
+        return HashProfile(
+            memory_cost=settings.PASSWORD_HASH_MEMORY_KIB,
+            time_cost=settings.PASSWORD_HASH_TIME_COST,
+            parallelism=settings.PASSWORD_HASH_PARALLELISM,
+        )
+
+    return HASH_PROFILES[settings.PASSWORD_HASH_PROFILE]
+
+
+_pwd_context: Optional[CryptContext] = None
+
+
+def use_hash_profile(profile: HashProfile) -> None:
+    """Hash new passwords with `profile` (called at app startup)."""
+    global _pwd_context
+    _pwd_context = profile.context()
+
+
+def _context() -> CryptContext:
+    if _pwd_context is None:
+        use_hash_profile(hash_profile(get_settings()))
+
+    return _pwd_context
 
 
 # ==========================
@@ -20,20 +85,334 @@ pwd_context: Final = CryptContext(
 # ==========================
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
+    return _context().verify(plain_password, hashed_password)
 
-# ==========================
-# Optional Future Feature
-# ==========================
 
 def needs_rehash(hashed_password: str) -> bool:
     """
     Returns True if password should be re-hashed
     (e.g., if security parameters changed).
     """
-    return pwd_context.needs_update(hashed_password)
+    return _context().needs_update(hashed_password)
+
+
+def verify_and_rehash(
+    plain_password: str,
+    hashed_password: str,
+) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password. When it matches but was hashed under other
+    parameters than the current profile, also return a new hash to
+    store in its place; otherwise the second value is None.
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+
+    if needs_rehash(hashed_password):
+        return True, hash_password(plain_password)
+
+    return True, None
+
+
+# ==========================
+# Bounded Hashing Pool
+# ==========================
+
+class HashPoolBusy(Exception):
+    """Raised instead of queueing a hash that would wait too long."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class HashPool:
+    """
+    Runs Argon2 work on a fixed number of threads so concurrent logins
+    can't multiply its memory cost without bound. argon2-cffi releases
+    the GIL, so threads give real parallelism here.
+
+    Admission control happens before anything is queued: a call is
+    rejected with HashPoolBusy when the wait queue is full, or when the
+    queue ahead of it would take longer than `max_wait` to drain at the
+    recently observed hash latency.
+
+    The pool has no threads until `start`, which the app lifespan calls
+    with the configured limits.
+    """
+
+    def __init__(self) -> None:
+        self.workers = 0
+        self.max_queue = 0
+        self.max_wait = 0.0
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self._pending = 0           # queued + running
+        self._running = 0
+        self._generation = 0        # bumped by start(); older work isn't counted
+        self._latency_ewma = 0.0    # seconds per hash, 0 until first sample
+
+        self.completed = 0
+        self.rejected = 0
+        self.total_hash_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    def start(self, workers: int, max_queue: int, max_wait: float) -> None:
+        self.shutdown()
+
+        with self._lock:
+            self.workers = workers
+            self.max_queue = max_queue
+            self.max_wait = max_wait
+            self._generation += 1
+            self._pending = 0
+            self._running = 0
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="argon2",
+            )
+
+    def _expected_wait(self) -> float:
+        queued_ahead = max(self._pending - self.workers + 1, 0)
+        return queued_ahead / self.workers * self._latency_ewma
+
+    def _admit(self) -> int:
+        with self._lock:
+            queue_full = self._pending >= self.workers + self.max_queue
+            expected_wait = self._expected_wait()
+
+            if queue_full or expected_wait > self.max_wait:
+                self.rejected += 1
+                PASSWORD_HASH_REJECTED.inc()
+                retry_after = max(
+                    math.ceil(expected_wait or self._latency_ewma), 1
+                )
+                raise HashPoolBusy(retry_after)
+
+            self._pending += 1
+            return self._generation
+
+    def _release(self, generation: int, future: Optional[Future]) -> None:
+        # Done callback, so work cancelled before it ran frees its slot too
+        with self._lock:
+            if generation == self._generation:
+                self._pending -= 1
+
+    def _run(
+        self,
+        generation: int,
+        submitted_at: float,
+        fn: Callable[..., T],
+        *args: Any,
+    ) -> T:
+        started_at = time.monotonic()
+
+        with self._lock:
+            if generation == self._generation:
+                self._running += 1
+
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.monotonic() - started_at
+            PASSWORD_HASH_DURATION.observe(elapsed, fn.__name__)
+            PASSWORD_HASH_QUEUE_WAIT.observe(started_at - submitted_at)
+
+            with self._lock:
+                if generation == self._generation:
+                    self._running -= 1
+                self.completed += 1
+                self.total_hash_seconds += elapsed
+                self.total_wait_seconds += started_at - submitted_at
+                self.max_hash_seconds = max(self.max_hash_seconds, elapsed)
+                self._latency_ewma = (
+                    elapsed
+                    if not self._latency_ewma
+                    else 0.8 * self._latency_ewma + 0.2 * elapsed
+                )
+
+    async def submit(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            raise RuntimeError("Password hashing pool isn't started")
+
+        generation = self._admit()
+
+        try:
+            future = self._executor.submit(
+                self._run, generation, time.monotonic(), fn, *args
+            )
+        except RuntimeError:
+            # Shut down between the check above and here
+            self._release(generation, None)
+            raise
+
+        future.add_done_callback(partial(self._release, generation))
+
+        # Cancelling the await cancels the future if it hasn't started
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._running,
+                "queue_depth": max(self._pending - self._running, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "hash_seconds_avg": (
+                    self.total_hash_seconds / self.completed
+                    if self.completed else 0.0
+                ),
+                "hash_seconds_max": self.max_hash_seconds,
+                "wait_seconds_avg": (
+                    self.total_wait_seconds / self.completed
+                    if self.completed else 0.0
+                ),
+            }
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = HashPool()
+
+Gauge(
+    "password_hash_queue_depth",
+    "Hashes waiting for a free worker.",
+    callback=lambda: hash_pool.stats()["queue_depth"],
+)
+
+Gauge(
+    "password_hash_in_flight",
+    "Hashes currently running.",
+    callback=lambda: hash_pool.stats()["in_flight"],
+)
+
+
+# ==========================
+# Calibration
+# ==========================
+
+# Below this Argon2 stops being meaningfully memory-hard
+MIN_MEMORY_KIB = 8192
+
+
+def _verify_ms(profile: HashProfile, samples: int) -> float:
+    context = profile.context()
+    hashed = context.hash("calibration password")
+
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibration password", hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(timings)
+
+
+def calibrate(
+    target_ms: float,
+    max_memory_kib: int,
+    parallelism: int = 1,
+    samples: int = 3,
+) -> tuple[HashProfile, float]:
+    """
+    Find the costliest parameters whose verify takes at most `target_ms`
+    on this host. Memory starts at the ceiling and halves until a single
+    pass fits, then time_cost rises as far as the target allows.
+    Returns the profile and its measured verify time; if even the
+    minimum memory misses the target, that profile is returned anyway.
+    """
+    memory = max_memory_kib
+
+    while True:
+        profile = HashProfile(memory, 1, parallelism)
+        elapsed = _verify_ms(profile, samples)
+
+        if elapsed <= target_ms or memory // 2 < MIN_MEMORY_KIB:
+            break
+        memory //= 2
+
+    if elapsed > target_ms:
+        return profile, elapsed
+
+    # Cost is linear in time_cost: start from the estimate and step
+    # down until a measurement fits
+    time_cost = max(int(target_ms // elapsed), 1)
+
+    while time_cost > 1:
+        candidate = HashProfile(memory, time_cost, parallelism)
+        candidate_ms = _verify_ms(candidate, samples)
+
+        if candidate_ms <= target_ms:
+            return candidate, candidate_ms
+        time_cost -= 1
+
+    return profile, elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.security")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_cmd = commands.add_parser(
+        "calibrate",
+        help="pick Argon2 parameters for this host",
+    )
+    calibrate_cmd.add_argument(
+        "--target-ms",
+        type=float,
+        default=250.0,
+        help="verify latency to aim for",
+    )
+    calibrate_cmd.add_argument(
+        "--max-memory-mib",
+        type=int,
+        default=64,
+        help="memory ceiling per hash (each hashing worker uses this much)",
+    )
+    calibrate_cmd.add_argument("--parallelism", type=int, default=1)
+    calibrate_cmd.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    profile, elapsed = calibrate(
+        args.target_ms,
+        args.max_memory_mib * 1024,
+        args.parallelism,
+        args.samples,
+    )
+
+    print(
+        f"memory_cost={profile.memory_cost} KiB time_cost={profile.time_cost} "
+        f"parallelism={profile.parallelism}: verify {elapsed:.1f} ms",
+        file=sys.stderr,
+    )
+
+    if elapsed > args.target_ms:
+        print(
+            f"Even {MIN_MEMORY_KIB // 1024} MiB misses {args.target_ms:.0f} ms "
+            "on this host; raise the target or use a bigger machine.",
+            file=sys.stderr,
+        )
+        return 1
+
+    print("PASSWORD_HASH_PROFILE=custom")
+    print(f"PASSWORD_HASH_MEMORY_KIB={profile.memory_cost}")
+    print(f"PASSWORD_HASH_TIME_COST={profile.time_cost}")
+    print(f"PASSWORD_HASH_PARALLELISM={profile.parallelism}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""
+Bulk-load synthetic users and tasks for benchmarks.
+
+    python -m app.seed --users 10000 --tasks-per-user 1000 --distribution zipf
+
+Rows go straight into users and tasks, with COPY on Postgres and
+batched executemany on SQLite, in a single transaction. Every user
+shares one password hash (computed once), so no Argon2 per row. The
+same arguments against the same database produce the same rows.
+
+Ids are allocated after the current maximum, so run it against a
+database nobody else is writing to. The per-row insert triggers on
+tasks are suspended during the load; task_counters and (on SQLite) the
+search index are rebuilt once at the end.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, TextIO
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Database
+from .models import TASK_COUNTER_DDL, TASK_SEARCH_DDL, TaskDB, UserDB
+from .security import hash_password
+from .task_counters import repair_task_counters
+
+DISTRIBUTIONS = ("uniform", "random", "zipf")
+
+USER_COLUMNS = ("id", "email", "hashed_password", "tasks_version")
+TASK_COLUMNS = ("id", "title", "priority", "completed", "user_id", "changed_version")
+
+# Titles are drawn from these so search has something to find
+VERBS = (
+    "Review", "Fix", "Write", "Plan", "Deploy", "Refactor", "Test", "Update",
+    "Document", "Benchmark", "Migrate", "Design", "Triage", "Schedule",
+)
+NOUNS = (
+    "invoice", "release", "dashboard", "report", "roadmap", "backlog",
+    "pipeline", "onboarding", "budget", "newsletter", "API", "database",
+    "meeting", "proposal", "checklist", "contract",
+)
+
+
+# ==========================
+# Generation
+# ==========================
+
+def task_counts(
+    users: int,
+    tasks_per_user: int,
+    distribution: str,
+    rng: random.Random,
+) -> list[int]:
+    """
+    Tasks for each user, averaging `tasks_per_user`:
+
+    - uniform: exactly that many each
+    - random:  uniformly between 0 and twice that
+    - zipf:    the i-th user's share falls off as 1/i, like a few heavy
+               accounts and a long tail
+    """
+    if users <= 0:
+        return []
+
+    if distribution == "uniform":
+        return [tasks_per_user] * users
+
+    if distribution == "random":
+        return [rng.randint(0, 2 * tasks_per_user) for _ in range(users)]
+
+    if distribution == "zipf":
+        total = users * tasks_per_user
+        weights = [1 / rank for rank in range(1, users + 1)]
+        scale = total / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+
+        # Hand out what rounding down left over, heaviest users first
+        for i in range(total - sum(counts)):
+            counts[i % users] += 1
+
+        return counts
+
+    raise ValueError(f"Unknown distribution {distribution!r}")
+
+
+def user_rows(
+    first_id: int,
+    count: int,
+    email_prefix: str,
+    hashed_password: str,
+) -> Iterator[tuple]:
+    for user_id in range(first_id, first_id + count):
+        yield user_id, f"{email_prefix}-{user_id}@example.com", hashed_password, 0
+
+
+def task_rows(
+    first_id: int,
+    user_ids: Iterable[int],
+    counts: Iterable[int],
+    completed_ratio: float,
+    rng: random.Random,
+) -> Iterator[tuple]:
+    task_id = first_id
+
+    for user_id, count in zip(user_ids, counts):
+        for _ in range(count):
+            yield (
+                task_id,
+                f"{rng.choice(VERBS)} {rng.choice(NOUNS)} #{task_id}",
+                rng.randint(1, 5),
+                rng.random() < completed_ratio,
+                user_id,
+                0,
+            )
+            task_id += 1
+
+
+# ==========================
+# Progress
+# ==========================
+
+class Progress:
+    """Rows written so far and the rate, at most once per `interval`."""
+
+    def __init__(
+        self,
+        label: str,
+        total: int,
+        stream: Optional[TextIO] = None,
+        interval: float = 1.0,
+    ) -> None:
+        self.label = label
+        self.total = total
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+
+        self.written = 0
+        self.started = time.perf_counter()
+        self._reported = self.started
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def rate(self) -> float:
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+    def advance(self, rows: int) -> None:
+        self.written += rows
+        now = time.perf_counter()
+
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self._print()
+
+    def finish(self) -> None:
+        self._print()
+
+    def _print(self) -> None:
+        percent = self.written / self.total * 100 if self.total else 100.0
+        print(
+            f"{self.label:<6} {self.written:>12,}/{self.total:,} "
+            f"({percent:5.1f}%)  {self.rate():>12,.0f} rows/s  "
+            f"{self.elapsed:7.1f}s",
+            file=self.stream,
+        )
+
+
+# ==========================
+# Writers
+# ==========================
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def _copy_rows(
+    db: Session,
+    table: str,
+    columns: tuple[str, ...],
+    rows: Iterable[tuple],
+    batch_size: int,
+    progress: Progress,
+) -> None:
+    # psycopg 3: one COPY stream, fed a batch at a time
+    connection = db.connection().connection.driver_connection
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+    with connection.cursor() as cursor, cursor.copy(statement) as copy:
+        for batch in _batches(rows, batch_size):
+            for row in batch:
+                copy.write_row(row)
+            progress.advance(len(batch))
+
+
+def _insert_rows(
+    db: Session,
+    table: str,
+    columns: tuple[str, ...],
+    rows: Iterable[tuple],
+    batch_size: int,
+    progress: Progress,
+) -> None:
+    connection = db.connection().connection.driver_connection
+    statement = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+
+    for batch in _batches(rows, batch_size):
+        connection.executemany(statement, batch)
+        progress.advance(len(batch))
+
+
+WRITERS = {
+    "postgresql": _copy_rows,
+    "sqlite": _insert_rows,
+}
+
+
+# Per-row AFTER INSERT triggers on tasks, by dialect
+INSERT_TRIGGERS = {
+    "sqlite": {
+        name: statement
+        for statement in (*TASK_SEARCH_DDL["sqlite"], *TASK_COUNTER_DDL["sqlite"])
+        for name in ("tasks_fts_ai", "task_counters_ai")
+        if statement.startswith(f"CREATE TRIGGER {name} ")
+    },
+}
+
+
+@contextmanager
+def _insert_triggers_suspended(db: Session, dialect: str) -> Iterator[None]:
+    """
+    Skip per-row trigger work while loading. Leaves rebuilding what the
+    triggers maintain to the caller, except the SQLite search index.
+    """
+    if dialect == "postgresql":
+        # Also locks tasks for the rest of the transaction
+        db.execute(text("LOCK TABLE users IN EXCLUSIVE MODE"))
+        db.execute(text("ALTER TABLE tasks DISABLE TRIGGER task_counters_sync"))
+        yield
+        db.execute(text("ALTER TABLE tasks ENABLE TRIGGER task_counters_sync"))
+        return
+
+    existing = set(db.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )).scalars())
+    suspended = {
+        name: statement
+        for name, statement in INSERT_TRIGGERS["sqlite"].items()
+        if name in existing
+    }
+
+    for name in suspended:
+        db.execute(text(f"DROP TRIGGER {name}"))
+
+    yield
+
+    for statement in suspended.values():
+        db.execute(text(statement))
+
+    if "tasks_fts_ai" in suspended:
+        db.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+
+# ==========================
+# Seeding
+# ==========================
+
+@dataclass
+class SeedReport:
+    users: int
+    tasks: int
+    first_user_id: int
+    last_user_id: int
+    seconds: float
+
+    def summary(self) -> str:
+        rate = self.tasks / self.seconds if self.seconds else 0.0
+        return (
+            f"Seeded {self.users:,} users (ids {self.first_user_id}-"
+            f"{self.last_user_id}) and {self.tasks:,} tasks in "
+            f"{self.seconds:.1f}s ({rate:,.0f} tasks/s)"
+        )
+
+
+def seed_database(
+    db: Session,
+    users: int,
+    tasks_per_user: int,
+    distribution: str = "uniform",
+    seed: int = 0,
+    password: str = "seed-password",
+    email_prefix: str = "seed",
+    completed_ratio: float = 0.3,
+    batch_size: int = 10_000,
+    hashed_password: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> SeedReport:
+    """
+    Append `users` users and their tasks in one transaction, then
+    rebuild task_counters. Emails are `<email_prefix>-<user id>@example.com`.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in WRITERS:
+        raise ValueError(f"Seeding isn't supported on {dialect}")
+
+    write = WRITERS[dialect]
+    rng = random.Random(seed)
+    counts = task_counts(users, tasks_per_user, distribution, rng)
+    total_tasks = sum(counts)
+
+    if hashed_password is None:
+        hashed_password = hash_password(password)
+
+    started = time.perf_counter()
+
+    with _insert_triggers_suspended(db, dialect):
+        first_user_id = db.scalar(select(func.coalesce(func.max(UserDB.id), 0))) + 1
+        first_task_id = db.scalar(select(func.coalesce(func.max(TaskDB.id), 0))) + 1
+
+        progress = Progress("users", users, stream)
+        write(
+            db, UserDB.__tablename__, USER_COLUMNS,
+            user_rows(first_user_id, users, email_prefix, hashed_password),
+            batch_size, progress,
+        )
+        progress.finish()
+
+        progress = Progress("tasks", total_tasks, stream)
+        write(
+            db, TaskDB.__tablename__, TASK_COLUMNS,
+            task_rows(
+                first_task_id,
+                range(first_user_id, first_user_id + users),
+                counts,
+                completed_ratio,
+                rng,
+            ),
+            batch_size, progress,
+        )
+        progress.finish()
+
+    if dialect == "postgresql":
+        # Explicit ids don't advance the serial sequences
+        for table in (UserDB.__tablename__, TaskDB.__tablename__):
+            db.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT max(id) FROM {table}))"
+            ))
+
+    # Commits the whole load
+    repair_task_counters(db)
+
+    return SeedReport(
+        users=users,
+        tasks=total_tasks,
+        first_user_id=first_user_id,
+        last_user_id=first_user_id + users - 1,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.seed")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=100)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="seed-password")
+    parser.add_argument("--email-prefix", default="seed")
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    database = Database(get_settings())
+    try:
+        with database.SessionLocal() as db:
+            report = seed_database(
+                db,
+                users=args.users,
+                tasks_per_user=args.tasks_per_user,
+                distribution=args.distribution,
+                seed=args.seed,
+                password=args.password,
+                email_prefix=args.email_prefix,
+                completed_ratio=args.completed_ratio,
+                batch_size=args.batch_size,
+            )
+    finally:
+        asyncio.run(database.dispose())
+
+    print(report.summary())
+    print(
+        f"Log in as {args.email_prefix}-{report.first_user_id}@example.com "
+        f"(through -{report.last_user_id}) with password {args.password!r}"
+    )
+
+
+if __name__ == "__main__":
+    main()
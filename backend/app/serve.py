@@ -0,0 +1,81 @@
+"""
+Production entry point:
+
+    python -m app.serve [--workers N] [--host H] [--port P]
+
+Server settings come from Settings (WEB_CONCURRENCY, SERVER_*,
+THREADPOOL_SIZE, DB_CONNECTION_BUDGET); the flags only override them.
+The app is passed to uvicorn as a factory import string, so this
+process never opens a database connection: each worker calls
+app.main.create_app() itself, and its lifespan builds the worker's own
+engine, sized to its share of the connection budget, and disposes it on
+graceful shutdown.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+import uvicorn
+
+from .config import get_settings, settings, use_settings
+
+logger = logging.getLogger("app.serve")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.serve")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workers = args.workers
+
+    if workers < 1:
+        logger.error("--workers must be at least 1")
+        return 2
+
+    if settings.DB_CONNECTION_BUDGET < workers:
+        logger.error(
+            "DB_CONNECTION_BUDGET=%d can't give %d workers a connection each",
+            settings.DB_CONNECTION_BUDGET,
+            workers,
+        )
+        return 2
+
+    # Workers read their settings from the environment: make sure they
+    # size their pools for the worker count actually started. A single
+    # worker runs in this process, whose settings are already loaded.
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    use_settings(get_settings().model_copy(update={"WEB_CONCURRENCY": workers}))
+
+    # Workers must share a metrics directory for /metrics to add up
+    if workers > 1 and not settings.METRICS_MULTIPROC_DIR:
+        os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+            prefix="taskforge-metrics-"
+        )
+
+    uvicorn.run(
+        "app.main:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS or None,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS,
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Rebuild task_counters from tasks.
+
+The counters are kept by triggers (see models.py), so this is only
+needed after restoring data with triggers disabled or to check for
+drift:
+
+    python -m app.task_counters [--user-id ID]
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Database
+from .models import TaskCounterDB, TaskDB, UserDB
+
+
+def repair_task_counters(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Replace the counters (of one user, or everyone) with a single
+    GROUP BY over tasks. Returns the number of counter rows written.
+    """
+    # Hold off concurrent task writes so the rebuild can't miss one
+    if db.get_bind().dialect.name == "postgresql":
+        if user_id is None:
+            db.execute(text("LOCK TABLE tasks IN SHARE MODE"))
+        else:
+            db.execute(
+                select(UserDB.id).where(UserDB.id == user_id).with_for_update()
+            )
+
+    clear = delete(TaskCounterDB)
+    counts = select(
+        TaskDB.user_id,
+        TaskDB.priority,
+        func.count(),
+        func.sum(case((TaskDB.completed, 1), else_=0)),
+    ).group_by(TaskDB.user_id, TaskDB.priority)
+
+    if user_id is not None:
+        clear = clear.where(TaskCounterDB.user_id == user_id)
+        counts = counts.where(TaskDB.user_id == user_id)
+
+    db.execute(clear)
+    written = db.execute(
+        insert(TaskCounterDB).from_select(
+            ["user_id", "priority", "total", "completed"],
+            counts,
+        )
+    ).rowcount
+    db.commit()
+
+    return written
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.task_counters")
+    parser.add_argument("--user-id", type=int, help="only rebuild this user")
+    args = parser.parse_args(argv)
+
+    database = Database(get_settings())
+    try:
+        with database.SessionLocal() as db:
+            written = repair_task_counters(db, args.user_id)
+    finally:
+        asyncio.run(database.dispose())
+
+    print(f"Rebuilt {written} task counter rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Load and latency benchmarks for the API hot paths.
+
+    python -m benchmarks --sizes 100,1000 --concurrency 1,8 \
+        --output results.json --compare benchmarks/baseline.json
+
+Runs in-process against app.main.create_app() by default (fresh SQLite
+file unless --database-url is given), or against a running server with
+--base-url. Results are JSON: p50/p95/p99 latency, throughput and, in
+process, queries per request for every scenario x size x concurrency,
+plus the app's import and lifespan startup times.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+from datetime import datetime, timezone
+
+from .harness import in_process_target, measure, remote_target
+from .scenarios import PASSWORD_HASHING, SCENARIOS, prepare_dataset
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--base-url", help="benchmark a running server instead")
+    parser.add_argument("--database-url", help="database for in-process runs")
+    parser.add_argument("--sizes", type=_int_list, default=[100, 1000])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--auth-requests",
+        type=int,
+        default=10,
+        help="requests for Argon2-bound scenarios (register, login)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda v: v.split(","),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--compare", help="baseline JSON to check against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative p95 slowdown before flagging a regression",
+    )
+
+    args = parser.parse_args(argv)
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    return args
+
+
+async def run(args: argparse.Namespace) -> dict:
+    target = (
+        remote_target(args.base_url)
+        if args.base_url
+        else await in_process_target(args.database_url)
+    )
+
+    if target.startup:
+        print(
+            f"startup import={target.startup['import_ms']:.1f}ms "
+            f"lifespan={target.startup['lifespan_ms']:.1f}ms",
+            file=sys.stderr,
+        )
+    rng = random.Random(args.seed)
+    results = []
+
+    try:
+        for size in args.sizes:
+            dataset = await prepare_dataset(target, size, rng)
+
+            for concurrency in args.concurrency:
+                for name in args.scenarios:
+                    requests = (
+                        args.auth_requests
+                        if name in PASSWORD_HASHING
+                        else args.requests
+                    )
+
+                    request = await SCENARIOS[name](
+                        target, dataset, concurrency, requests, rng
+                    )
+                    measurement = await measure(
+                        target, name, size, concurrency, requests, request
+                    )
+
+                    summary = measurement.summary()
+                    results.append(summary)
+                    _print_row(summary)
+    finally:
+        await target.close()
+
+    return {
+        "meta": {
+            "target": target.description,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "startup": target.startup,
+        },
+        "results": results,
+    }
+
+
+def _print_row(summary: dict) -> None:
+    qpr = summary["queries_per_request"]
+    print(
+        f"{summary['scenario']:<18} size={summary['dataset_size']:<6} "
+        f"c={summary['concurrency']:<3} "
+        f"p50={summary['p50_ms']:>8.2f}ms p95={summary['p95_ms']:>8.2f}ms "
+        f"p99={summary['p99_ms']:>8.2f}ms "
+        f"rps={summary['throughput_rps']:>8.1f} "
+        f"q/req={'-' if qpr is None else qpr} "
+        f"errors={summary['errors']}",
+        file=sys.stderr,
+    )
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `report` against `baseline`, as readable lines."""
+    key = lambda r: (r["scenario"], r["dataset_size"], r["concurrency"])
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+
+    for result in report["results"]:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+
+        label = "{} size={} c={}".format(*key(result))
+
+        # Ignore sub-millisecond jitter on very fast paths
+        allowed = max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + 1)
+        if result["p95_ms"] > allowed:
+            regressions.append(
+                f"{label}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms"
+            )
+
+        if (
+            result["queries_per_request"] is not None
+            and before["queries_per_request"] is not None
+            and result["queries_per_request"] > before["queries_per_request"]
+        ):
+            regressions.append(
+                f"{label}: queries/request "
+                f"{before['queries_per_request']} -> {result['queries_per_request']}"
+            )
+
+        if result["errors"] > before["errors"]:
+            regressions.append(
+                f"{label}: errors {before['errors']} -> {result['errors']}"
+            )
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import asyncio
+import math
+import os
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+import httpx
+from sqlalchemy import create_engine, event
+
+
+# ==========================
+# Query Counting
+# ==========================
+
+class QueryCounter:
+    """Counts statements executed on an engine (sync or async)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+    def attach(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+
+# ==========================
+# Targets
+# ==========================
+
+@dataclass
+class Target:
+    client: httpx.AsyncClient
+    queries: Optional[QueryCounter] = None
+    description: str = ""
+    startup: Optional[dict] = None      # in-process: import/lifespan ms
+    _stack: AsyncExitStack = field(default_factory=AsyncExitStack)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self._stack.aclose()
+
+
+async def in_process_target(database_url: Optional[str] = None) -> Target:
+    """
+    Drive an app from app.main.create_app() over ASGI, against
+    `database_url` or a fresh SQLite file. The app's own lifespan,
+    engine and pool settings are used, so changes to database.py show
+    up in the numbers. Import and lifespan startup are timed too.
+    """
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix="taskforge-bench-")
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+    # Every request comes from one client; measure the handlers instead
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Repeated list reads would otherwise measure the cache, not the query
+    os.environ.setdefault("TASK_LIST_CACHE_MAX_BYTES", "0")
+
+    started = time.perf_counter()
+    from app.main import create_app
+    from app.database import Base
+    imported = time.perf_counter()
+
+    # Schema first: startup already reads from it (token revocations)
+    schema_engine = create_engine(database_url)
+    Base.metadata.create_all(bind=schema_engine)
+    schema_engine.dispose()
+
+    app = create_app()
+    stack = AsyncExitStack()
+    started_lifespan = time.perf_counter()
+    await stack.enter_async_context(app.router.lifespan_context(app))
+    ready = time.perf_counter()
+
+    database = app.state.database
+
+    queries = QueryCounter()
+    queries.attach(database.engine)
+    if database.async_engine is not None:
+        queries.attach(database.async_engine.sync_engine)
+
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://benchmark",
+    )
+
+    return Target(
+        client=client,
+        queries=queries,
+        description=f"in-process ({database.engine.url.get_backend_name()})",
+        startup={
+            "import_ms": round((imported - started) * 1000, 3),
+            "lifespan_ms": round((ready - started_lifespan) * 1000, 3),
+        },
+        _stack=stack,
+    )
+
+
+def remote_target(base_url: str) -> Target:
+    """Drive a running server, e.g. a local uvicorn. Queries aren't counted."""
+    client = httpx.AsyncClient(base_url=base_url, timeout=60)
+    return Target(client=client, description=f"remote ({base_url})")
+
+
+# ==========================
+# Measurement
+# ==========================
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (which needn't be sorted)."""
+    if not samples:
+        return 0.0
+
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class Measurement:
+    scenario: str
+    dataset_size: int
+    concurrency: int
+    requests: int
+    errors: int
+    wall_seconds: float
+    latencies: list[float]
+    queries: Optional[int]
+
+    def summary(self) -> dict:
+        ok = self.requests - self.errors
+        return {
+            "scenario": self.scenario,
+            "dataset_size": self.dataset_size,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+            "throughput_rps": round(ok / self.wall_seconds, 2)
+            if self.wall_seconds else 0.0,
+            "queries_per_request": round(self.queries / self.requests, 2)
+            if self.queries is not None and self.requests else None,
+        }
+
+
+async def measure(
+    target: Target,
+    scenario: str,
+    dataset_size: int,
+    concurrency: int,
+    requests: int,
+    make_request: Callable[[int, int], Awaitable[httpx.Response]],
+) -> Measurement:
+    """
+    Issue `requests` calls of `make_request(worker, i)` from
+    `concurrency` concurrent workers. Responses with status >= 400
+    count as errors but are still timed.
+    """
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors, next_index
+
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+
+            started = time.perf_counter()
+            response = await make_request(worker_id, i)
+            latencies.append(time.perf_counter() - started)
+
+            if response.status_code >= 400:
+                errors += 1
+
+    queries_before = target.queries.count if target.queries else None
+    started = time.perf_counter()
+
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+
+    wall = time.perf_counter() - started
+    queries = (
+        target.queries.count - queries_before
+        if target.queries else None
+    )
+
+    return Measurement(
+        scenario=scenario,
+        dataset_size=dataset_size,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        wall_seconds=wall,
+        latencies=latencies,
+        queries=queries,
+    )
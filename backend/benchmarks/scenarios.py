@@ -0,0 +1,269 @@
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+from .harness import Target
+
+PASSWORD = "benchmark-password"
+
+# Default batch endpoint limit (TASK_BATCH_MAX_ITEMS)
+SEED_CHUNK = 500
+
+RequestFn = Callable[[int, int], Awaitable[httpx.Response]]
+
+
+# ==========================
+# Datasets
+# ==========================
+
+@dataclass
+class Dataset:
+    size: int
+    email: str
+    headers: dict[str, str]
+    task_ids: list[int] = field(default_factory=list)
+
+
+async def register_and_login(client: httpx.AsyncClient, email: str) -> dict:
+    await client.post(
+        "/auth/register",
+        json={"email": email, "password": PASSWORD},
+    )
+
+    response = await client.post(
+        "/auth/login",
+        data={"username": email, "password": PASSWORD},
+    )
+    response.raise_for_status()
+
+    return response.json()
+
+
+async def create_tasks(
+    client: httpx.AsyncClient,
+    headers: dict[str, str],
+    count: int,
+    rng: random.Random,
+) -> list[int]:
+    ids: list[int] = []
+
+    for start in range(0, count, SEED_CHUNK):
+        items = [
+            {"title": f"Task {start + i}", "priority": rng.randint(1, 5)}
+            for i in range(min(SEED_CHUNK, count - start))
+        ]
+
+        response = await client.post(
+            "/tasks/batch",
+            json={"items": items},
+            headers=headers,
+        )
+        response.raise_for_status()
+
+        ids.extend(result["id"] for result in response.json()["results"])
+
+    return ids
+
+
+async def prepare_dataset(target: Target, size: int, rng: random.Random) -> Dataset:
+    """One user owning `size` tasks with random priorities."""
+    email = f"bench-{size}-{uuid.uuid4().hex[:8]}@example.com"
+    tokens = await register_and_login(target.client, email)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    dataset = Dataset(size=size, email=email, headers=headers)
+    dataset.task_ids = await create_tasks(target.client, headers, size, rng)
+
+    return dataset
+
+
+# ==========================
+# Scenarios
+# ==========================
+
+# Each scenario does its setup and returns the request to time:
+# `request(worker, i)` for i in range(requests).
+
+async def register(target, dataset, concurrency, requests, rng) -> RequestFn:
+    run = uuid.uuid4().hex[:8]
+
+    async def request(worker, i):
+        return await target.client.post(
+            "/auth/register",
+            json={"email": f"register-{run}-{i}@example.com", "password": PASSWORD},
+        )
+
+    return request
+
+
+async def login(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        return await target.client.post(
+            "/auth/login",
+            data={"username": dataset.email, "password": PASSWORD},
+        )
+
+    return request
+
+
+async def refresh(target, dataset, concurrency, requests, rng) -> RequestFn:
+    # Refresh tokens are single-use, so each worker follows its own chain
+    tokens = []
+    for _ in range(concurrency):
+        response = await target.client.post(
+            "/auth/login",
+            data={"username": dataset.email, "password": PASSWORD},
+        )
+        tokens.append(response.json()["refresh_token"])
+
+    async def request(worker, i):
+        response = await target.client.post(
+            "/auth/refresh",
+            json={"refresh_token": tokens[worker]},
+        )
+        if response.status_code == 200:
+            tokens[worker] = response.json()["refresh_token"]
+        return response
+
+    return request
+
+
+async def create_task(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        return await target.client.post(
+            "/tasks",
+            json={"title": f"Created {i}", "priority": rng.randint(1, 5)},
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def list_tasks(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        return await target.client.get(
+            "/tasks",
+            params={"limit": 20},
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def get_task(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        task_id = dataset.task_ids[i % len(dataset.task_ids)]
+        return await target.client.get(
+            f"/tasks/{task_id}",
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def search_tasks(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        return await target.client.get(
+            "/tasks/search",
+            params={"q": f"task {i % 100}", "limit": 20},
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def update_task(target, dataset, concurrency, requests, rng) -> RequestFn:
+    async def request(worker, i):
+        task_id = dataset.task_ids[i % len(dataset.task_ids)]
+        return await target.client.put(
+            f"/tasks/{task_id}",
+            json={"completed": i % 2 == 0},
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def delete_task(target, dataset, concurrency, requests, rng) -> RequestFn:
+    # Delete freshly created tasks so the dataset keeps its size
+    doomed = await create_tasks(target.client, dataset.headers, requests, rng)
+
+    async def request(worker, i):
+        return await target.client.delete(
+            f"/tasks/{doomed[i]}",
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def deep_page_offset(target, dataset, concurrency, requests, rng) -> RequestFn:
+    skip = max(dataset.size - 20, 0)
+
+    async def request(worker, i):
+        return await target.client.get(
+            "/tasks",
+            params={"skip": skip, "limit": 20},
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+async def deep_page_cursor(target, dataset, concurrency, requests, rng) -> RequestFn:
+    # Walk to the cursor for the same last page deep_page_offset reads
+    cursor = None
+    seen = 0
+
+    while seen < dataset.size - 20:
+        limit = min(100, dataset.size - 20 - seen)
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+
+        response = await target.client.get(
+            "/tasks",
+            params=params,
+            headers=dataset.headers,
+        )
+        seen += len(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+
+        if cursor is None:
+            break
+
+    async def request(worker, i):
+        params = {"limit": 20}
+        if cursor:
+            params["cursor"] = cursor
+
+        return await target.client.get(
+            "/tasks",
+            params=params,
+            headers=dataset.headers,
+        )
+
+    return request
+
+
+# Read scenarios first so writes don't skew them; register last since
+# it only adds users.
+SCENARIOS: dict[str, Callable[..., Awaitable[RequestFn]]] = {
+    "login": login,
+    "refresh": refresh,
+    "list_tasks": list_tasks,
+    "get_task": get_task,
+    "deep_page_offset": deep_page_offset,
+    "deep_page_cursor": deep_page_cursor,
+    "search_tasks": search_tasks,
+    "update_task": update_task,
+    "create_task": create_task,
+    "delete_task": delete_task,
+    "register": register,
+}
+
+# Argon2-bound scenarios run with --auth-requests instead of --requests
+PASSWORD_HASHING = {"register", "login"}
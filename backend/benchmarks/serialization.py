@@ -0,0 +1,97 @@
+"""
+CPU cost per row of the two task read paths (see app/serializers.py):
+
+    python -m benchmarks.serialization --rows 100 --iterations 500
+
+"orm" loads TaskDB objects and encodes them the way FastAPI does for
+response_model=list[TaskResponse]; "fast" selects the response columns
+and encodes the rows directly. Both run against in-memory SQLite, so
+the numbers are mostly Python-side work.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    return parser.parse_args(argv)
+
+
+def cpu_per_row(fn, rows: int, iterations: int) -> float:
+    """CPU microseconds per row of fn(), best of three rounds."""
+    best = float("inf")
+
+    for _ in range(3):
+        started = time.process_time()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.process_time() - started)
+
+    return best / (iterations * rows) * 1e6
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base
+    from app.models import TaskDB, UserDB
+    from app.routers.tasks import TASK_COLUMNS
+    from app.schemas import TaskResponse
+    from app.serializers import task_list_json
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        db.add(UserDB(id=1, email="bench@example.com", hashed_password="x"))
+        db.execute(insert(TaskDB), [
+            {"title": f"Task {i}", "priority": i % 5, "completed": i % 2 == 0, "user_id": 1}
+            for i in range(args.rows)
+        ])
+        db.commit()
+
+    # What FastAPI does with a response_model: validate, then dump
+    response_model = TypeAdapter(list[TaskResponse])
+
+    def orm_path():
+        with Session(engine) as db:
+            tasks = db.query(TaskDB).filter(TaskDB.user_id == 1).all()
+            return response_model.dump_json(response_model.validate_python(tasks))
+
+    def fast_path():
+        with Session(engine) as db:
+            rows = db.query(*TASK_COLUMNS).filter(TaskDB.user_id == 1).all()
+            return task_list_json(rows)
+
+    assert json.loads(orm_path()) == json.loads(fast_path())
+
+    orm_us = cpu_per_row(orm_path, args.rows, args.iterations)
+    fast_us = cpu_per_row(fast_path, args.rows, args.iterations)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "iterations": args.iterations,
+        "orm_us_per_row": round(orm_us, 3),
+        "fast_us_per_row": round(fast_us, 3),
+        "saved_us_per_row": round(orm_us - fast_us, 3),
+        "speedup": round(orm_us / fast_us, 2) if fast_us else None,
+    }, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,17 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Skip objects created by raw DDL in models.py (search, counters)."""
+    if type_ == "table" and name.startswith(models.DDL_MANAGED_TABLE_PREFIXES):
+        return False
+
+    if type_ == "index" and name in models.DDL_MANAGED_INDEXES:
+        return False
+
+    return True
+
+
 # ==========================
 # OFFLINE MODE
 # ==========================
@@ -29,6 +40,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=settings.DATABASE_URL,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -54,6 +66,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
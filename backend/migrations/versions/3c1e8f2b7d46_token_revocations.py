@@ -0,0 +1,51 @@
+"""token revocations
+
+Revision ID: 3c1e8f2b7d46
+Revises: 9a2a3af96a0b
+Create Date: 2026-10-18 04:12:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e8f2b7d46'
+down_revision: Union[str, Sequence[str], None] = '9a2a3af96a0b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'token_revocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=32), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        op.f('ix_token_revocations_revoked_at'),
+        'token_revocations',
+        ['revoked_at'],
+        unique=False,
+    )
+    op.create_index(
+        op.f('ix_token_revocations_expires_at'),
+        'token_revocations',
+        ['expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_token_revocations_expires_at'), table_name='token_revocations')
+    op.drop_index(op.f('ix_token_revocations_revoked_at'), table_name='token_revocations')
+    op.drop_table('token_revocations')
@@ -0,0 +1,77 @@
+"""tasks title search
+
+Revision ID: 5add7a689c4a
+Revises: ebc777a816d8
+Create Date: 2026-10-18 03:13:57.869427
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5add7a689c4a'
+down_revision: Union[str, Sequence[str], None] = 'ebc777a816d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+POSTGRES_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE INDEX ix_tasks_title_search ON tasks "
+    "USING gin (user_id, to_tsvector('simple', title))",
+]
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+    "title, content='tasks', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title) VALUES (new.id, new.title); "
+    "END",
+    "CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title) "
+    "VALUES ('delete', old.id, old.title); "
+    "END",
+    "CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title) "
+    "VALUES ('delete', old.id, old.title); "
+    "INSERT INTO tasks_fts(rowid, title) VALUES (new.id, new.title); "
+    "END",
+    # Index the rows that already exist
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nothing filters or sorts on the bare title
+    op.drop_index('ix_tasks_title', table_name='tasks')
+
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        statements = POSTGRES_UPGRADE
+    elif dialect == 'sqlite':
+        statements = SQLITE_UPGRADE
+    else:
+        statements = []
+
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_tasks_title_search")
+    elif dialect == 'sqlite':
+        for trigger in ('tasks_fts_ai', 'tasks_fts_ad', 'tasks_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS tasks_fts")
+
+    op.create_index('ix_tasks_title', 'tasks', ['title'], unique=False)
@@ -0,0 +1,33 @@
+"""tasks keyset index
+
+Revision ID: 6fb36d6ca061
+Revises: 8ba182f95072
+Create Date: 2026-10-18 02:58:29.075780
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6fb36d6ca061'
+down_revision: Union[str, Sequence[str], None] = '8ba182f95072'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_tasks_user_completed_priority_id',
+        'tasks',
+        ['user_id', 'completed', 'priority', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_user_completed_priority_id', table_name='tasks')
@@ -0,0 +1,75 @@
+"""hash refresh tokens
+
+Revision ID: 9571b084a280
+Revises: 6fb36d6ca061
+Create Date: 2026-10-18 03:03:09.083563
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9571b084a280'
+down_revision: Union[str, Sequence[str], None] = '6fb36d6ca061'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+refresh_tokens = sa.table(
+    'refresh_tokens',
+    sa.column('id', sa.Integer),
+    sa.column('token', sa.String),
+    sa.column('token_hash', sa.LargeBinary),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'refresh_tokens',
+        sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True),
+    )
+
+    # Backfill digests so existing sessions survive the migration
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(refresh_tokens.c.id, refresh_tokens.c.token)
+    ).all()
+
+    for row_id, token in rows:
+        conn.execute(
+            refresh_tokens.update()
+            .where(refresh_tokens.c.id == row_id)
+            .values(token_hash=hashlib.sha256(token.encode()).digest())
+        )
+
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.alter_column('token_hash', nullable=False)
+        batch_op.drop_index('ix_refresh_tokens_token')
+        batch_op.drop_column('token')
+        batch_op.create_index(
+            batch_op.f('ix_refresh_tokens_token_hash'),
+            ['token_hash'],
+            unique=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Raw tokens can't be recovered from their digests, so outstanding
+    # refresh tokens are dropped and users have to log in again.
+    op.execute(refresh_tokens.delete())
+
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_refresh_tokens_token_hash'))
+        batch_op.drop_column('token_hash')
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=False))
+        batch_op.create_index(
+            'ix_refresh_tokens_token',
+            ['token'],
+            unique=True,
+        )
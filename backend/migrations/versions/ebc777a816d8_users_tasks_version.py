@@ -0,0 +1,37 @@
+"""users tasks version
+
+Revision ID: ebc777a816d8
+Revises: 9571b084a280
+Create Date: 2026-10-18 03:05:23.024929
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ebc777a816d8'
+down_revision: Union[str, Sequence[str], None] = '9571b084a280'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column(
+            'tasks_version',
+            sa.Integer(),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('tasks_version')
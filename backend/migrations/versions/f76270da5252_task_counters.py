@@ -0,0 +1,127 @@
+"""task counters
+
+Revision ID: f76270da5252
+Revises: 5add7a689c4a
+Create Date: 2026-10-18 03:16:33.407865
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f76270da5252'
+down_revision: Union[str, Sequence[str], None] = '5add7a689c4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE FUNCTION task_counters_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE task_counters
+            SET total = total - 1,
+                completed = completed - OLD.completed::int
+            WHERE user_id = OLD.user_id AND priority = OLD.priority;
+
+            DELETE FROM task_counters
+            WHERE user_id = OLD.user_id
+              AND priority = OLD.priority
+              AND total = 0;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO task_counters (user_id, priority, total, completed)
+            VALUES (NEW.user_id, NEW.priority, 1, NEW.completed::int)
+            ON CONFLICT (user_id, priority) DO UPDATE
+            SET total = task_counters.total + 1,
+                completed = task_counters.completed + EXCLUDED.completed;
+        END IF;
+
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "CREATE TRIGGER task_counters_sync "
+    "AFTER INSERT OR DELETE OR UPDATE OF user_id, priority, completed "
+    "ON tasks FOR EACH ROW EXECUTE FUNCTION task_counters_apply()",
+]
+
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER task_counters_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO task_counters (user_id, priority, total, completed) "
+    "VALUES (new.user_id, new.priority, 1, new.completed) "
+    "ON CONFLICT (user_id, priority) DO UPDATE "
+    "SET total = total + 1, completed = completed + excluded.completed; "
+    "END",
+    "CREATE TRIGGER task_counters_ad AFTER DELETE ON tasks BEGIN "
+    "UPDATE task_counters "
+    "SET total = total - 1, completed = completed - old.completed "
+    "WHERE user_id = old.user_id AND priority = old.priority; "
+    "DELETE FROM task_counters "
+    "WHERE user_id = old.user_id AND priority = old.priority AND total = 0; "
+    "END",
+    "CREATE TRIGGER task_counters_au "
+    "AFTER UPDATE OF user_id, priority, completed ON tasks BEGIN "
+    "UPDATE task_counters "
+    "SET total = total - 1, completed = completed - old.completed "
+    "WHERE user_id = old.user_id AND priority = old.priority; "
+    "DELETE FROM task_counters "
+    "WHERE user_id = old.user_id AND priority = old.priority AND total = 0; "
+    "INSERT INTO task_counters (user_id, priority, total, completed) "
+    "VALUES (new.user_id, new.priority, 1, new.completed) "
+    "ON CONFLICT (user_id, priority) DO UPDATE "
+    "SET total = total + 1, completed = completed + excluded.completed; "
+    "END",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'task_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'priority'),
+    )
+
+    # Backfill before the triggers start counting
+    op.execute(
+        "INSERT INTO task_counters (user_id, priority, total, completed) "
+        "SELECT user_id, priority, count(*), "
+        "sum(CASE WHEN completed THEN 1 ELSE 0 END) "
+        "FROM tasks GROUP BY user_id, priority"
+    )
+
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        statements = POSTGRES_TRIGGERS
+    elif dialect == 'sqlite':
+        statements = SQLITE_TRIGGERS
+    else:
+        statements = []
+
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS task_counters_sync ON tasks")
+        op.execute("DROP FUNCTION IF EXISTS task_counters_apply()")
+    elif dialect == 'sqlite':
+        for trigger in ('task_counters_ai', 'task_counters_ad', 'task_counters_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    op.drop_table('task_counters')
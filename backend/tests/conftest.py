@@ -0,0 +1,19 @@
+import pytest
+
+from app.query_stats import capture_requests
+
+
+# ==========================
+# QUERY BUDGETS
+# ==========================
+
+@pytest.fixture()
+def request_queries():
+    """
+    QueryStats of every request made during the test, in order:
+
+        client.get("/tasks", headers=headers)
+        assert request_queries[-1].count <= 2
+    """
+    with capture_requests() as captured:
+        yield captured
@@ -1,11 +1,18 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, async_database_url, get_db
+from app.dependencies.auth import principal_cache
+from app.metrics import instrument_engine
+from app.rate_limit import limiter
+from app.models import UserDB
 
 
 # ==========================
@@ -21,6 +28,7 @@ def client():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    instrument_engine(engine, "test")
 
     TestingSessionLocal = sessionmaker(
         autocommit=False,
@@ -38,6 +46,41 @@ def client():
             db.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    principal_cache.clear()
+    limiter.storage.clear()
+
+    with TestClient(app) as c:
+        yield c
+
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def async_client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+
+    Base.metadata.create_all(bind=create_engine(url))
+
+    # NullPool: each request opens its connection on the running loop
+    engine = create_async_engine(
+        async_database_url(url),
+        poolclass=NullPool,
+    )
+    instrument_engine(engine.sync_engine, "test")
+
+    TestingAsyncSessionLocal = async_sessionmaker(
+        bind=engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    principal_cache.clear()
+    limiter.storage.clear()
 
     with TestClient(app) as c:
         yield c
@@ -192,3 +235,1720 @@ def test_user_cannot_access_another_users_task(client):
     )
 
     assert response.status_code == 404
+
+
+def test_current_user_is_served_from_principal_cache(client):
+    client.post(
+        "/auth/register",
+        json={
+            "email": "cached@example.com",
+            "password": "testpassword"
+        }
+    )
+
+    login_response = client.post(
+        "/auth/login",
+        data={
+            "username": "cached@example.com",
+            "password": "testpassword"
+        }
+    )
+
+    headers = {
+        "Authorization": f"Bearer {login_response.json()['access_token']}"
+    }
+
+    before = principal_cache.stats()
+
+    assert client.get("/tasks", headers=headers).status_code == 200
+    assert client.get("/tasks", headers=headers).status_code == 200
+
+    after = principal_cache.stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_principal_cache_invalidated_when_user_deleted(client):
+    client.post(
+        "/auth/register",
+        json={
+            "email": "deleted@example.com",
+            "password": "testpassword"
+        }
+    )
+
+    login_response = client.post(
+        "/auth/login",
+        data={
+            "username": "deleted@example.com",
+            "password": "testpassword"
+        }
+    )
+
+    headers = {
+        "Authorization": f"Bearer {login_response.json()['access_token']}"
+    }
+
+    assert client.get("/tasks", headers=headers).status_code == 200
+
+    db = next(app.dependency_overrides[get_db]())
+    db.delete(db.query(UserDB).filter(UserDB.email == "deleted@example.com").one())
+    db.commit()
+    db.close()
+
+    assert client.get("/tasks", headers=headers).status_code == 401
+
+
+def auth_headers(client, email):
+    client.post(
+        "/auth/register",
+        json={"email": email, "password": "testpassword"}
+    )
+
+    login_response = client.post(
+        "/auth/login",
+        data={"username": email, "password": "testpassword"}
+    )
+
+    return {
+        "Authorization": f"Bearer {login_response.json()['access_token']}"
+    }
+
+
+def test_cursor_pagination_walks_every_task_once(client):
+    headers = auth_headers(client, "pager@example.com")
+
+    for i, priority in enumerate([3, 1, 3, 2, 3, 1, 2]):
+        client.post(
+            "/tasks",
+            json={"title": f"Task {i}", "priority": priority},
+            headers=headers
+        )
+
+    for desc in (True, False):
+        seen = []
+        params = {"limit": 3, "sort_by_priority_desc": desc}
+
+        while True:
+            response = client.get("/tasks", params=params, headers=headers)
+            assert response.status_code == 200
+            seen.extend(response.json())
+
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if next_cursor is None:
+                break
+            params["cursor"] = next_cursor
+
+        keys = [(t["priority"], t["id"]) for t in seen]
+        assert len(keys) == 7
+        assert keys == sorted(keys, reverse=desc)
+
+
+def test_cursor_pagination_rejects_bad_cursor(client):
+    headers = auth_headers(client, "badcursor@example.com")
+
+    response = client.get(
+        "/tasks",
+        params={"cursor": "not-a-cursor"},
+        headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_batch_create_update_delete(client):
+    headers = auth_headers(client, "batch@example.com")
+    other_headers = auth_headers(client, "batch-other@example.com")
+
+    response = client.post(
+        "/tasks/batch",
+        json={"items": [
+            {"title": "One", "priority": 1},
+            {"title": "Two", "priority": 2},
+            {"title": "Three", "priority": 3},
+        ]},
+        headers=headers
+    )
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [r["task"]["title"] for r in results] == ["One", "Two", "Three"]
+    ids = [r["id"] for r in results]
+
+    foreign_id = client.post(
+        "/tasks",
+        json={"title": "Not yours", "priority": 1},
+        headers=other_headers
+    ).json()["id"]
+
+    response = client.patch(
+        "/tasks/batch",
+        json={"items": [
+            {"id": ids[0], "completed": True},
+            {"id": ids[1], "title": "Two!", "completed": True},
+            {"id": foreign_id, "completed": True},
+        ]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 404]
+    assert results[0]["task"]["completed"] is True
+    assert results[1]["task"]["title"] == "Two!"
+
+    untouched = client.get(f"/tasks/{ids[2]}", headers=headers).json()
+    assert untouched["title"] == "Three"
+    assert untouched["completed"] is False
+
+    response = client.request(
+        "DELETE",
+        "/tasks/batch",
+        json={"ids": [ids[0], ids[1], foreign_id]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == [204, 204, 404]
+
+    remaining = client.get("/tasks", headers=headers).json()
+    assert [t["id"] for t in remaining] == [ids[2]]
+    assert client.get(f"/tasks/{foreign_id}", headers=other_headers).status_code == 200
+
+
+def test_batch_rejects_oversized_requests(client, monkeypatch):
+    from app.config import settings
+
+    headers = auth_headers(client, "bigbatch@example.com")
+    monkeypatch.setattr(settings, "TASK_BATCH_MAX_ITEMS", 2)
+
+    response = client.request(
+        "DELETE",
+        "/tasks/batch",
+        json={"ids": [1, 2, 3]},
+        headers=headers
+    )
+    assert response.status_code == 422
+
+    # Rejected on length alone, before any item is validated
+    response = client.post(
+        "/tasks/batch",
+        json={"items": [{"bogus": i} for i in range(3)]},
+        headers=headers
+    )
+    assert response.status_code == 422
+    errors = response.json()["detail"]
+    assert len(errors) == 1
+    assert "At most 2 items per batch" in errors[0]["msg"]
+
+
+def test_batch_update_and_delete_reject_duplicate_ids(client):
+    headers = auth_headers(client, "dupbatch@example.com")
+    task_id = client.post(
+        "/tasks", json={"title": "Once", "priority": 1}, headers=headers
+    ).json()["id"]
+
+    response = client.patch(
+        "/tasks/batch",
+        json={"items": [
+            {"id": task_id, "title": "First"},
+            {"id": task_id, "title": "Second"},
+        ]},
+        headers=headers
+    )
+    assert response.status_code == 422
+    assert f"Duplicate task ids: [{task_id}]" in response.json()["detail"][0]["msg"]
+    assert client.get(f"/tasks/{task_id}", headers=headers).json()["title"] == "Once"
+
+    response = client.request(
+        "DELETE",
+        "/tasks/batch",
+        json={"ids": [task_id, task_id]},
+        headers=headers
+    )
+    assert response.status_code == 422
+    assert client.get(f"/tasks/{task_id}", headers=headers).status_code == 200
+
+
+def test_async_session_mode_serves_task_crud(async_client):
+    headers = auth_headers(async_client, "async@example.com")
+
+    created = async_client.post(
+        "/tasks",
+        json={"title": "Async Task", "priority": 2},
+        headers=headers
+    )
+    assert created.status_code == 201
+    task_id = created.json()["id"]
+
+    updated = async_client.put(
+        f"/tasks/{task_id}",
+        json={"completed": True},
+        headers=headers
+    )
+    assert updated.status_code == 200
+    assert updated.json()["completed"] is True
+
+    listed = async_client.get("/tasks", headers=headers)
+    assert [t["id"] for t in listed.json()] == [task_id]
+
+    exported = async_client.get("/tasks/export", headers=headers)
+    assert exported.status_code == 200
+    assert len(exported.text.splitlines()) == 1
+
+    deleted = async_client.delete(f"/tasks/{task_id}", headers=headers)
+    assert deleted.status_code == 204
+    assert async_client.get(f"/tasks/{task_id}", headers=headers).status_code == 404
+
+
+def test_hash_pool_rejects_when_saturated():
+    import asyncio
+    import threading
+
+    from app.security import HashPool, HashPoolBusy
+
+    pool = HashPool()
+    pool.start(workers=1, max_queue=1, max_wait=60)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.submit(release.wait))
+        queued = asyncio.ensure_future(pool.submit(release.wait))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(HashPoolBusy) as busy:
+            await pool.submit(release.wait)
+
+        assert busy.value.retry_after >= 1
+        assert pool.stats()["queue_depth"] == 1
+
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(scenario())
+
+    stats = pool.stats()
+    assert stats["completed"] == 2
+    assert stats["rejected"] == 1
+    pool.shutdown()
+
+
+def test_hash_pool_frees_slots_of_cancelled_and_dropped_work():
+    import asyncio
+    import threading
+
+    from app.security import HashPool
+
+    pool = HashPool()
+    pool.start(workers=1, max_queue=1, max_wait=60)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.submit(release.wait))
+        queued = asyncio.ensure_future(pool.submit(release.wait))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["queue_depth"] == 1
+
+        # The client went away before its hash started
+        queued.cancel()
+        await asyncio.sleep(0)
+        assert pool.stats()["queue_depth"] == 0
+
+        # Its slot is free again
+        again = asyncio.ensure_future(pool.submit(release.wait))
+        await asyncio.sleep(0.05)
+
+        # A restart drops queued work and starts counting afresh
+        pool.start(workers=1, max_queue=1, max_wait=60)
+        release.set()
+        await asyncio.gather(running, return_exceptions=True)
+        await asyncio.gather(again, return_exceptions=True)
+
+        assert pool.stats()["queue_depth"] == 0
+        assert pool.stats()["in_flight"] == 0
+        assert await pool.submit(sum, [1, 2]) == 3
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_login_returns_503_when_hash_pool_busy(client, monkeypatch):
+    from app.security import HashPoolBusy, hash_pool
+
+    async def busy(*args):
+        raise HashPoolBusy(retry_after=3)
+
+    client.post(
+        "/auth/register",
+        json={"email": "busy@example.com", "password": "testpassword"}
+    )
+    monkeypatch.setattr(hash_pool, "submit", busy)
+
+    response = client.post(
+        "/auth/login",
+        data={"username": "busy@example.com", "password": "testpassword"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_refresh_rotates_token_exactly_once(client):
+    client.post(
+        "/auth/register",
+        json={"email": "rotate@example.com", "password": "testpassword"}
+    )
+
+    tokens = [
+        client.post(
+            "/auth/login",
+            data={"username": "rotate@example.com", "password": "testpassword"}
+        ).json()["refresh_token"]
+        for _ in range(2)
+    ]
+    assert tokens[0] != tokens[1]
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens[0]})
+    assert response.status_code == 200
+    assert "access_token" in response.json()
+    rotated = response.json()["refresh_token"]
+
+    # The rotated-out token can't be replayed
+    response = client.post("/auth/refresh", json={"refresh_token": tokens[0]})
+    assert response.status_code == 401
+
+    # The replacement and other sessions still work
+    for token in (rotated, tokens[1]):
+        response = client.post("/auth/refresh", json={"refresh_token": token})
+        assert response.status_code == 200
+
+
+def test_export_streams_all_tasks(client):
+    import csv
+    import io
+    import json
+
+    headers = auth_headers(client, "export@example.com")
+    other_headers = auth_headers(client, "export-other@example.com")
+
+    client.post(
+        "/tasks/batch",
+        json={"items": [
+            {"title": f"Task {i}", "priority": i % 3} for i in range(5)
+        ]},
+        headers=headers
+    )
+    client.post("/tasks", json={"title": "Hidden", "priority": 1}, headers=other_headers)
+
+    response = client.get("/tasks/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["title"] for r in rows] == [f"Task {i}" for i in range(5)]
+    assert rows[0].keys() == {"id", "title", "priority", "completed"}
+
+    response = client.get("/tasks/export", params={"format": "csv"}, headers=headers)
+    assert response.status_code == 200
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["title"] for r in records] == [f"Task {i}" for i in range(5)]
+
+    response = client.get("/tasks/export", params={"format": "xml"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_conditional_get_returns_304_until_tasks_change(client):
+    headers = auth_headers(client, "etag@example.com")
+
+    task_id = client.post(
+        "/tasks",
+        json={"title": "Cached", "priority": 1},
+        headers=headers
+    ).json()["id"]
+
+    for url in ("/tasks", f"/tasks/{task_id}"):
+        first = client.get(url, headers=headers)
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        again = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.headers["ETag"] == etag
+
+    # Different query -> different representation
+    filtered = client.get(
+        "/tasks",
+        params={"completed": "false"},
+        headers={**headers, "If-None-Match": client.get("/tasks", headers=headers).headers["ETag"]}
+    )
+    assert filtered.status_code == 200
+
+    list_etag = client.get("/tasks", headers=headers).headers["ETag"]
+    client.put(f"/tasks/{task_id}", json={"completed": True}, headers=headers)
+
+    changed = client.get("/tasks", headers={**headers, "If-None-Match": list_etag})
+    assert changed.status_code == 200
+    assert changed.json()[0]["completed"] is True
+    assert changed.headers["ETag"] != list_etag
+
+    # Another user's identical version never matches
+    other_headers = auth_headers(client, "etag-other@example.com")
+    client.post("/tasks", json={"title": "Mine", "priority": 1}, headers=other_headers)
+    client.post("/tasks", json={"title": "Mine too", "priority": 1}, headers=other_headers)
+    response = client.get(
+        "/tasks",
+        headers={**other_headers, "If-None-Match": changed.headers["ETag"]}
+    )
+    assert response.status_code == 200
+
+
+def test_benchmark_percentiles_and_regression_check():
+    from benchmarks.__main__ import compare
+    from benchmarks.harness import percentile
+
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+
+    def report(p95, qpr):
+        return {"results": [{
+            "scenario": "list_tasks", "dataset_size": 100, "concurrency": 1,
+            "p95_ms": p95, "queries_per_request": qpr, "errors": 0,
+        }]}
+
+    assert compare(report(10.0, 2.0), report(10.0, 2.0), 0.25) == []
+    assert len(compare(report(20.0, 2.0), report(10.0, 2.0), 0.25)) == 1
+    assert len(compare(report(10.0, 3.0), report(10.0, 2.0), 0.25)) == 1
+
+
+def test_metrics_endpoint_exposes_route_and_pool_metrics(client):
+    headers = auth_headers(client, "metrics@example.com")
+    task_id = client.post(
+        "/tasks",
+        json={"title": "Measured", "priority": 1},
+        headers=headers
+    ).json()["id"]
+    client.get(f"/tasks/{task_id}", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/tasks",le="+Inf"}' in body
+    assert "# TYPE db_pool_checked_out gauge" in body
+    assert 'password_hash_duration_seconds_count{operation="hash_password"}' in body
+
+
+def test_metrics_merge_worker_snapshots():
+    from app.metrics import Counter, Gauge, Registry, _merge, render
+
+    def worker(requests, in_flight):
+        registry = Registry()
+        Counter("jobs_total", "Jobs.", ("kind",), registry=registry).inc("a", amount=requests)
+        Gauge("busy", "Busy.", registry=registry).set(in_flight)
+        return registry.snapshot()
+
+    merged = render(_merge([
+        (worker(3, 1), True),
+        (worker(4, 2), True),
+        (worker(5, 7), False),
+    ]))
+
+    assert 'jobs_total{kind="a"} 12' in merged
+    assert "busy 3" in merged
+
+
+def test_engine_instrumentation_survives_errors_and_dispose(tmp_path):
+    import gc
+
+    from sqlalchemy import text
+    from sqlalchemy.pool import QueuePool
+
+    from app.metrics import DB_POOL_SIZE
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}", poolclass=QueuePool)
+    instrument_engine(engine, "instrumented")
+
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT missing_column"))
+        assert conn.info["query_started"] == []
+
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_started"] == []
+
+    assert ("instrumented",) in DB_POOL_SIZE.callback()
+
+    # Disposed, or replaced and collected: no longer reported or kept
+    engine.dispose()
+    assert ("instrumented",) not in DB_POOL_SIZE.callback()
+
+    instrument_engine(
+        create_engine(f"sqlite:///{tmp_path / 'm.db'}", poolclass=QueuePool),
+        "instrumented",
+    )
+    gc.collect()
+    assert ("instrumented",) not in DB_POOL_SIZE.callback()
+
+
+def test_task_routes_stay_within_query_budgets(client, request_queries):
+    headers = auth_headers(client, "budget@example.com")
+    client.get("/tasks", headers=headers)  # warm the principal cache
+
+    task_id = client.post(
+        "/tasks",
+        json={"title": "Budgeted", "priority": 1},
+        headers=headers
+    ).json()["id"]
+    assert request_queries[-1].count <= 3
+
+    budgets = [
+        ("GET", "/tasks", 2),
+        ("GET", f"/tasks/{task_id}", 2),
+        ("PUT", f"/tasks/{task_id}", 2),
+        ("PATCH", f"/tasks/{task_id}", 2),
+        ("DELETE", f"/tasks/{task_id}", 3),   # + tombstone (+ pruning later on)
+    ]
+
+    for method, url, budget in budgets:
+        kwargs = {"json": {"completed": True}} if method in ("PUT", "PATCH") else {}
+        response = client.request(method, url, headers=headers, **kwargs)
+        assert response.status_code < 400
+        assert request_queries[-1].count <= budget, (method, url)
+
+
+def test_sql_debug_headers_and_repeat_warning(client, monkeypatch, caplog):
+    from app.config import settings
+    from app.query_stats import QueryStats, _report_repeats
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    headers = auth_headers(client, "debugheaders@example.com")
+
+    response = client.get("/tasks", headers=headers)
+    assert int(response.headers["X-DB-Query-Count"]) >= 1
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+
+    stats = QueryStats(method="GET", path="/tasks")
+    for _ in range(settings.QUERY_REPEAT_WARN_THRESHOLD):
+        stats.record("SELECT * FROM tasks WHERE id = ?", 0.001)
+
+    with caplog.at_level("WARNING", logger="app.sql"):
+        _report_repeats(stats)
+    assert "Possible N+1 in GET /tasks" in caplog.text
+
+
+def test_auth_routes_stay_within_query_budgets(client, request_queries):
+    credentials = {"email": "authbudget@example.com", "password": "secret123"}
+
+    client.post("/auth/register", json=credentials)
+    assert request_queries[-1].count <= 2
+
+    tokens = client.post(
+        "/auth/login",
+        data={"username": credentials["email"], "password": credentials["password"]}
+    ).json()
+    assert request_queries[-1].count <= 2
+
+    client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert request_queries[-1].count <= 2
+
+
+def test_search_tasks_prefix_ranked_and_scoped(client, request_queries):
+    headers = auth_headers(client, "search@example.com")
+    other = auth_headers(client, "search-other@example.com")
+
+    for title in ["Buy milk", "Buy bread", "Build shed", "Write report"]:
+        client.post("/tasks", json={"title": title, "priority": 1}, headers=headers)
+    client.post("/tasks", json={"title": "Buy milk", "priority": 1}, headers=other)
+
+    response = client.get("/tasks/search", params={"q": "bu"}, headers=headers)
+    assert response.status_code == 200
+    assert sorted(t["title"] for t in response.json()) == [
+        "Build shed", "Buy bread", "Buy milk",
+    ]
+    assert request_queries[-1].count <= 2
+
+    response = client.get("/tasks/search", params={"q": "BUY mi"}, headers=headers)
+    assert [t["title"] for t in response.json()] == ["Buy milk"]
+
+    page = client.get(
+        "/tasks/search",
+        params={"q": "bu", "limit": 2, "skip": 2},
+        headers=headers
+    )
+    assert len(page.json()) == 1
+
+    # The index follows renames and deletes
+    report_id = client.get(
+        "/tasks/search", params={"q": "report"}, headers=headers
+    ).json()[0]["id"]
+    client.put(f"/tasks/{report_id}", json={"title": "Buy stamps"}, headers=headers)
+    assert client.get(
+        "/tasks/search", params={"q": "report"}, headers=headers
+    ).json() == []
+    assert len(client.get(
+        "/tasks/search", params={"q": "buy"}, headers=headers
+    ).json()) == 3
+
+    client.delete(f"/tasks/{report_id}", headers=headers)
+    assert len(client.get(
+        "/tasks/search", params={"q": "buy"}, headers=headers
+    ).json()) == 2
+
+    # Punctuation only: nothing to match
+    assert client.get(
+        "/tasks/search", params={"q": "\"*"}, headers=headers
+    ).json() == []
+
+
+def test_task_stats_follow_every_write_path(client, request_queries):
+    headers = auth_headers(client, "stats@example.com")
+
+    def stats():
+        response = client.get("/tasks/stats", headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    assert stats() == {"total": 0, "completed": 0, "open": 0, "by_priority": []}
+
+    # One counter read once the principal is cached
+    stats()
+    assert request_queries[-1].count == 1
+
+    first = client.post(
+        "/tasks",
+        json={"title": "One", "priority": 1},
+        headers=headers
+    ).json()["id"]
+    batch_ids = [
+        result["id"]
+        for result in client.post(
+            "/tasks/batch",
+            json={"items": [
+                {"title": "Two", "priority": 2},
+                {"title": "Three", "priority": 2},
+                {"title": "Four", "priority": 3},
+            ]},
+            headers=headers
+        ).json()["results"]
+    ]
+
+    client.put(f"/tasks/{first}", json={"completed": True}, headers=headers)
+    client.patch(
+        "/tasks/batch",
+        json={"items": [{"id": batch_ids[0], "completed": True, "priority": 3}]},
+        headers=headers
+    )
+    client.request(
+        "DELETE",
+        "/tasks/batch",
+        json={"ids": [batch_ids[1]]},
+        headers=headers
+    )
+
+    assert stats() == {
+        "total": 3,
+        "completed": 2,
+        "open": 1,
+        "by_priority": [
+            {"priority": 1, "total": 1, "completed": 1, "open": 0},
+            {"priority": 3, "total": 2, "completed": 1, "open": 1},
+        ],
+    }
+
+    client.delete(f"/tasks/{first}", headers=headers)
+    assert stats()["by_priority"] == [
+        {"priority": 3, "total": 2, "completed": 1, "open": 1},
+    ]
+
+
+def test_repair_task_counters_rebuilds_from_tasks(client):
+    from app.database import get_db
+    from app.models import TaskCounterDB
+    from app.task_counters import repair_task_counters
+
+    headers = auth_headers(client, "repair@example.com")
+    for priority in (1, 1, 2):
+        client.post(
+            "/tasks",
+            json={"title": "Task", "priority": priority},
+            headers=headers
+        )
+    expected = client.get("/tasks/stats", headers=headers).json()
+
+    db = next(app.dependency_overrides[get_db]())
+    db.query(TaskCounterDB).update({"total": 99})
+    db.commit()
+    assert client.get("/tasks/stats", headers=headers).json() != expected
+
+    assert repair_task_counters(db) == 2
+    assert client.get("/tasks/stats", headers=headers).json() == expected
+    db.close()
+
+
+def test_fast_serialization_matches_default_responses(client, monkeypatch):
+    from app.config import settings
+
+    headers = auth_headers(client, "fastjson@example.com")
+    client.post(
+        "/tasks/batch",
+        json={"items": [
+            {"title": f"Task {i} ✓", "priority": i % 3} for i in range(5)
+        ]},
+        headers=headers
+    )
+
+    def read_all():
+        listing = client.get("/tasks", params={"limit": 2}, headers=headers)
+        single = client.get(
+            f"/tasks/{listing.json()[0]['id']}",
+            headers=headers
+        )
+        export = client.get("/tasks/export", headers=headers)
+        return listing, single, export
+
+    default = read_all()
+    monkeypatch.setattr(settings, "FAST_TASK_SERIALIZATION", True)
+    fast = read_all()
+
+    for before, after in zip(default, fast):
+        assert after.status_code == 200
+        assert after.headers["content-type"] == before.headers["content-type"]
+
+    listing, single, export = fast
+    assert listing.json() == default[0].json()
+    assert listing.headers["ETag"] == default[0].headers["ETag"]
+    assert listing.headers["X-Next-Cursor"] == default[0].headers["X-Next-Cursor"]
+    assert single.json() == default[1].json()
+    assert single.headers["ETag"] == default[1].headers["ETag"]
+    assert [
+        json.loads(line) for line in export.text.splitlines()
+    ] == [
+        json.loads(line) for line in default[2].text.splitlines()
+    ]
+
+    missing = client.get("/tasks/999999", headers=headers)
+    assert missing.status_code == 404
+
+
+def test_login_throttled_per_account_before_any_work(client, monkeypatch, request_queries):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_PER_ACCOUNT", 2)
+    credentials = {"username": "Throttle@example.com", "password": "wrong"}
+
+    for _ in range(2):
+        response = client.post("/auth/login", data=credentials)
+        assert response.status_code == 401
+
+    # Same account in another case: still the same bucket
+    response = client.post(
+        "/auth/login",
+        data={**credentials, "username": "throttle@example.com"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert request_queries[-1].count == 0
+
+    # Other accounts from the same client are unaffected
+    response = client.post(
+        "/auth/login",
+        data={"username": "other@example.com", "password": "wrong"}
+    )
+    assert response.status_code == 401
+
+
+def test_register_and_refresh_throttled_per_ip(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_REGISTER_PER_IP", 1)
+    monkeypatch.setattr(settings, "RATE_LIMIT_REFRESH_PER_IP", 1)
+
+    assert client.post(
+        "/auth/register",
+        json={"email": "ip1@example.com", "password": "secret123"}
+    ).status_code == 201
+    assert client.post(
+        "/auth/register",
+        json={"email": "ip2@example.com", "password": "secret123"}
+    ).status_code == 429
+
+    for expected in (401, 429):
+        response = client.post("/auth/refresh", json={"refresh_token": "junk"})
+        assert response.status_code == expected
+
+
+def test_memory_bucket_storage_refills_and_evicts():
+    from app.rate_limit import MemoryBucketStorage
+
+    now = [0.0]
+    storage = MemoryBucketStorage(max_buckets=2, clock=lambda: now[0])
+
+    # 2 per second, burst of 2
+    assert storage.take("a", rate=2, capacity=2) == 0
+    assert storage.take("a", rate=2, capacity=2) == 0
+    assert storage.take("a", rate=2, capacity=2) == pytest.approx(0.5)
+
+    now[0] += 0.5
+    assert storage.take("a", rate=2, capacity=2) == 0
+
+    storage.take("b", rate=2, capacity=2)
+    storage.take("c", rate=2, capacity=2)
+    assert len(storage) == 2
+
+    # "a" was least recently used, so it starts over with a full bucket
+    assert storage.take("a", rate=2, capacity=2) == 0
+
+
+def test_health_and_readiness(client, monkeypatch):
+    database = client.app.state.database
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["database"] == "ok"
+    assert body["pools"]["primary"]["saturated"] is False
+
+    # No free connection: not ready, and the database isn't pinged
+    monkeypatch.setitem(database.options, "pool_size", 0)
+    monkeypatch.setitem(database.options, "max_overflow", 0)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "pool exhausted"
+
+
+def test_pool_options_split_connection_budget():
+    from app.config import settings
+    from app.database import engine_pool_options, pool_options
+
+    def sized(budget, workers):
+        options = pool_options(settings.model_copy(update={
+            "DB_CONNECTION_BUDGET": budget,
+            "WEB_CONCURRENCY": workers,
+        }))
+        return options["pool_size"], options["max_overflow"]
+
+    assert sized(15, 1) == (5, 10)
+    assert sized(100, 4) == (8, 17)
+    assert sized(4, 4) == (1, 0)
+
+    # Async mode: the sync engine's small pool comes out of the share
+    sync, async_ = engine_pool_options(settings.model_copy(update={
+        "DB_CONNECTION_BUDGET": 15,
+        "WEB_CONCURRENCY": 1,
+        "DATABASE_ASYNC": True,
+    }))
+    assert (sync["pool_size"], sync["max_overflow"]) == (1, 0)
+    assert (async_["pool_size"], async_["max_overflow"]) == (4, 10)
+
+
+def test_serve_sizes_in_process_worker_for_the_workers_flag(monkeypatch):
+    from app import serve
+    from app.config import get_settings, use_settings
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    previous = use_settings(get_settings().model_copy(update={"WEB_CONCURRENCY": 3}))
+    started = []
+    monkeypatch.setattr(
+        serve.uvicorn, "run",
+        lambda *args, **kwargs: started.append(get_settings().WEB_CONCURRENCY),
+    )
+
+    try:
+        assert serve.main(["--workers", "1"]) == 0
+    finally:
+        use_settings(previous)
+
+    assert started == [1]
+
+
+def test_patch_task_partial_update_and_missing(client):
+    headers = auth_headers(client, "patch@example.com")
+    other = auth_headers(client, "patch-other@example.com")
+
+    task = client.post(
+        "/tasks",
+        json={"title": "Patch me", "priority": 2},
+        headers=headers
+    ).json()
+    etag = client.get(f"/tasks/{task['id']}", headers=headers).headers["ETag"]
+
+    response = client.patch(
+        f"/tasks/{task['id']}",
+        json={"completed": True},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {**task, "completed": True}
+
+    # The write moved the version, so the old ETag no longer matches
+    assert client.get(
+        f"/tasks/{task['id']}",
+        headers={**headers, "If-None-Match": etag}
+    ).status_code == 200
+
+    # Empty patch: nothing changes, the task is returned as is
+    assert client.patch(
+        f"/tasks/{task['id']}", json={}, headers=headers
+    ).json() == {**task, "completed": True}
+
+    # Someone else's task, or no task at all
+    for url in (f"/tasks/{task['id']}", "/tasks/999999"):
+        assert client.patch(url, json={"title": "x"}, headers=other).status_code == 404
+        assert client.delete(url, headers=other).status_code == 404
+        assert client.patch(url, json={}, headers=other).status_code == 404
+
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 204
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 404
+
+
+def test_changes_feed_replays_writes_since_token(client, request_queries):
+    headers = auth_headers(client, "changes@example.com")
+    other = auth_headers(client, "changes-other@example.com")
+
+    def changes(since=None):
+        params = {"since": since} if since else {}
+        response = client.get("/tasks/changes", params=params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    keep = client.post(
+        "/tasks", json={"title": "Keep", "priority": 1}, headers=headers
+    ).json()
+    doomed = client.post(
+        "/tasks", json={"title": "Doomed", "priority": 1}, headers=headers
+    ).json()
+
+    # Bootstrap: no changes, just where we are now
+    start = changes()
+    assert start["changes"] == [] and start["deleted"] == []
+
+    client.patch(f"/tasks/{keep['id']}", json={"completed": True}, headers=headers)
+    created = client.post(
+        "/tasks/batch",
+        json={"items": [{"title": "New", "priority": 2}]},
+        headers=headers
+    ).json()["results"][0]["task"]
+    client.delete(f"/tasks/{doomed['id']}", headers=headers)
+    client.post("/tasks", json={"title": "Not mine", "priority": 1}, headers=other)
+
+    delta = changes(start["next"])
+    assert sorted(delta["changes"], key=lambda t: t["id"]) == [
+        {**keep, "completed": True},
+        created,
+    ]
+    assert delta["deleted"] == [doomed["id"]]
+
+    # Up to date: nothing new, one query once the principal is cached
+    assert changes(delta["next"]) == {**delta, "changes": [], "deleted": []}
+    assert request_queries[-1].count == 1
+
+    # Writes that matched nothing don't move the version
+    client.request("DELETE", "/tasks/batch", json={"ids": [999999]}, headers=headers)
+    client.patch("/tasks/999999", json={"title": "x"}, headers=headers)
+    assert changes(delta["next"])["next"] == delta["next"]
+
+
+def test_batch_update_only_versions_tasks_it_changes(client):
+    headers = auth_headers(client, "batch-versions@example.com")
+
+    first, second = [
+        client.post("/tasks", json={"title": title, "priority": 1}, headers=headers).json()
+        for title in ("First", "Second")
+    ]
+    token = client.get("/tasks/changes", headers=headers).json()["next"]
+
+    response = client.patch(
+        "/tasks/batch",
+        json={"items": [{"id": first["id"]}, {"id": second["id"], "priority": 3}]},
+        headers=headers
+    )
+    assert [r["status"] for r in response.json()["results"]] == [200, 200]
+    assert response.json()["results"][0]["task"] == first
+
+    delta = client.get(
+        "/tasks/changes", params={"since": token}, headers=headers
+    ).json()
+    assert delta["changes"] == [{**second, "priority": 3}]
+
+
+def test_changes_feed_rejects_bad_and_stale_tokens(client, monkeypatch):
+    from app.pagination import decode_sync_token, encode_sync_token
+    from app.routers import tasks as tasks_router
+
+    headers = auth_headers(client, "changes-tokens@example.com")
+    other = auth_headers(client, "changes-tokens-other@example.com")
+
+    token = client.get("/tasks/changes", headers=headers).json()["next"]
+
+    assert client.get(
+        "/tasks/changes", params={"since": "garbage"}, headers=headers
+    ).status_code == 400
+    assert client.get(
+        "/tasks/changes", params={"since": token}, headers=other
+    ).status_code == 400
+
+    user_id, version = decode_sync_token(token)
+    ahead = encode_sync_token(user_id, version + 1)
+    assert client.get(
+        "/tasks/changes", params={"since": ahead}, headers=headers
+    ).status_code == 410
+
+    monkeypatch.setattr(tasks_router, "CHANGES_MAX", 2)
+    client.post(
+        "/tasks/batch",
+        json={"items": [{"title": f"T{i}", "priority": 1} for i in range(3)]},
+        headers=headers
+    )
+    assert client.get(
+        "/tasks/changes", params={"since": token}, headers=headers
+    ).status_code == 410
+
+
+def test_old_tombstones_are_pruned_past_the_changes_window(client, monkeypatch):
+    from app.models import TaskTombstoneDB
+    from app.routers import tasks as tasks_router
+
+    monkeypatch.setattr(tasks_router, "CHANGES_MAX", 3)
+    headers = auth_headers(client, "tombstones@example.com")
+
+    token = client.get("/tasks/changes", headers=headers).json()["next"]
+
+    ids = [
+        client.post("/tasks", json={"title": f"T{i}", "priority": 1}, headers=headers).json()["id"]
+        for i in range(4)
+    ]
+    for task_id in ids:
+        client.delete(f"/tasks/{task_id}", headers=headers)
+
+    # Deletes were versions 5-8; only those after 8 - 3 keep a tombstone
+    db = next(app.dependency_overrides[get_db]())
+    kept = db.query(TaskTombstoneDB.task_id).order_by(TaskTombstoneDB.version).all()
+    db.close()
+    assert [row.task_id for row in kept] == ids[1:]
+
+    # A token from before the pruned deletes must reload, not miss them
+    assert client.get(
+        "/tasks/changes", params={"since": token}, headers=headers
+    ).status_code == 410
+
+
+def test_subscription_coalesces_and_overflows_to_resync():
+    from app.events import RESYNC, Subscription, TaskEvent
+
+    sub = Subscription(user_id=1, max_pending=2)
+
+    sub.push([TaskEvent("created", 1, {"id": 1}), TaskEvent("created", 2, {"id": 2})])
+    sub.push([TaskEvent("updated", 1, {"id": 1, "title": "x"})])
+
+    # One slot per task, latest event wins, ordered by last change
+    assert sub.drain() == [
+        TaskEvent("created", 2, {"id": 2}).to_sse(),
+        TaskEvent("updated", 1, {"id": 1, "title": "x"}).to_sse(),
+    ]
+    assert sub.drain() == []
+
+    sub.push([TaskEvent("deleted", i) for i in range(3)])
+    assert sub.drain() == [RESYNC]
+
+    sub.push([TaskEvent("deleted", 9)])
+    assert sub.drain() == ['event: task.deleted\ndata: {"id": 9}\n\n']
+
+
+def test_task_writes_publish_events(client):
+    from app.events import broadcaster
+    from app.pagination import decode_sync_token
+
+    headers = auth_headers(client, "stream@example.com")
+    other = auth_headers(client, "stream-other@example.com")
+    user_id, _ = decode_sync_token(
+        client.get("/tasks/changes", headers=headers).json()["next"]
+    )
+
+    sub = broadcaster.subscribe(user_id)
+    try:
+        task = client.post(
+            "/tasks", json={"title": "Live", "priority": 1}, headers=headers
+        ).json()
+        client.patch(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+        client.post("/tasks", json={"title": "Not mine", "priority": 1}, headers=other)
+
+        # Coalesced: one event for the task, carrying its latest state
+        assert sub.drain() == [
+            "event: task.updated\n"
+            f"data: {json.dumps({**task, 'completed': True})}\n\n"
+        ]
+
+        batch = client.post(
+            "/tasks/batch",
+            json={"items": [{"title": "B", "priority": 2}]},
+            headers=headers
+        ).json()["results"][0]["task"]
+        client.request(
+            "DELETE", "/tasks/batch", json={"ids": [task["id"]]}, headers=headers
+        )
+
+        assert sub.drain() == [
+            f"event: task.created\ndata: {json.dumps(batch)}\n\n",
+            f'event: task.deleted\ndata: {{"id": {task["id"]}}}\n\n',
+        ]
+
+        # Writes that change nothing stay quiet
+        client.patch(f"/tasks/{batch['id']}", json={}, headers=headers)
+        client.delete("/tasks/999999", headers=headers)
+        assert sub.drain() == []
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+def test_task_stream_sends_events_and_heartbeats(client, monkeypatch):
+    import asyncio
+
+    from app.config import settings
+    from app.events import TaskEvent, broadcaster
+    from app.pagination import decode_sync_token
+
+    assert client.get("/tasks/stream").status_code == 401
+
+    headers = auth_headers(client, "stream-sse@example.com")
+    user_id, _ = decode_sync_token(
+        client.get("/tasks/changes", headers=headers).json()["next"]
+    )
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.05)
+
+    # TestClient buffers streaming bodies, so drive the ASGI app directly
+    async def run():
+        sent = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        def body():
+            return b"".join(m.get("body", b"") for m in sent[1:]).decode()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/tasks/stream",
+            "raw_path": b"/tasks/stream",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", headers["Authorization"].encode()),
+            ],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+        request = asyncio.create_task(app(scope, receive, send))
+
+        async with asyncio.timeout(5):
+            while broadcaster.subscriber_count() == 0:
+                await asyncio.sleep(0.01)
+
+            await broadcaster.publish(user_id, [TaskEvent("deleted", 7)])
+
+            while "task.deleted" not in body() or ": heartbeat" not in body():
+                await asyncio.sleep(0.01)
+
+            disconnected.set()
+            await request
+
+        return sent, body()
+
+    sent, body = asyncio.run(run())
+
+    start = sent[0]
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+    assert 'event: task.deleted\ndata: {"id": 7}\n\n' in body
+
+    # Closing the stream drops the subscription
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_importing_app_reads_no_settings_and_opens_nothing():
+    import os
+    import subprocess
+    import sys
+
+    env = {
+        k: v for k, v in os.environ.items()
+        if k not in ("SECRET_KEY", "DATABASE_URL")
+    }
+    code = (
+        "import app.main, app.config, app.database\n"
+        "assert app.config._active is None\n"
+        "assert not app.database._open_databases\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+def test_create_app_owns_settings_engine_and_caches(tmp_path):
+    from app.config import Settings, get_settings
+    from app.main import create_app
+
+    own = Settings(
+        SECRET_KEY="factory-secret-" + "x" * 32,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'factory.db'}",
+        PRINCIPAL_CACHE_SIZE=7,
+    )
+    Base.metadata.create_all(bind=create_engine(own.DATABASE_URL))
+
+    before = get_settings()
+    factory_app = create_app(own)
+
+    # No get_db override: requests use the engine the lifespan built
+    with TestClient(factory_app) as c:
+        assert get_settings() is own
+        assert principal_cache.maxsize == 7
+
+        headers = auth_headers(c, "factory@example.com")
+        assert c.post(
+            "/tasks", json={"title": "Factory", "priority": 1}, headers=headers
+        ).status_code == 201
+
+        database = factory_app.state.database
+        assert database.engine.url.database == str(tmp_path / "factory.db")
+
+    assert get_settings() is before
+    assert not hasattr(factory_app.state, "database")
+    assert database.engine.pool.checkedin() == 0
+
+
+def test_login_rehashes_password_under_current_profile(client, request_queries):
+    from app.config import settings
+    from app.database import get_db
+    from app.security import HASH_PROFILES, hash_profile, use_hash_profile
+
+    def stored_hash():
+        db = next(app.dependency_overrides[get_db]())
+        try:
+            return db.query(UserDB.hashed_password).filter(
+                UserDB.email == "rehash@example.com"
+            ).scalar()
+        finally:
+            db.close()
+
+    def login():
+        response = client.post(
+            "/auth/login",
+            data={"username": "rehash@example.com", "password": "testpassword"}
+        )
+        assert response.status_code == 200
+
+    client.post(
+        "/auth/register",
+        json={"email": "rehash@example.com", "password": "testpassword"}
+    )
+    original = stored_hash()
+    assert "m=102400,t=2,p=8" in original
+
+    use_hash_profile(HASH_PROFILES["compact"])
+    try:
+        # Upgraded in the login's own transaction: one extra statement
+        login()
+        assert request_queries[-1].count == 3
+        rehashed = stored_hash()
+        assert "m=19456,t=2,p=1" in rehashed
+
+        login()
+        assert request_queries[-1].count == 2
+        assert stored_hash() == rehashed
+    finally:
+        use_hash_profile(hash_profile(settings))
+
+    # And back again when the profile moves the other way
+    login()
+    assert "m=102400,t=2,p=8" in stored_hash()
+
+
+def test_hash_profiles_and_calibration(capsys):
+    from app.config import settings
+    from app.security import calibrate, hash_profile, main
+
+    custom = settings.model_copy(update={
+        "PASSWORD_HASH_PROFILE": "custom",
+        "PASSWORD_HASH_MEMORY_KIB": 8192,
+        "PASSWORD_HASH_TIME_COST": 3,
+        "PASSWORD_HASH_PARALLELISM": 1,
+    })
+    assert (hash_profile(custom).memory_cost, hash_profile(custom).time_cost) == (8192, 3)
+
+    profile, elapsed = calibrate(target_ms=100, max_memory_kib=8192, samples=1)
+    assert profile.memory_cost == 8192 and profile.time_cost >= 1
+    assert elapsed <= 100
+
+    assert main(["calibrate", "--target-ms", "100", "--max-memory-mib", "8",
+                 "--samples", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "PASSWORD_HASH_PROFILE=custom\nPASSWORD_HASH_MEMORY_KIB=8192\n" in out
+
+
+def test_replica_routing_round_robin_read_your_writes_and_ejection(tmp_path):
+    import shutil
+    import sqlite3
+
+    from app.config import Settings
+    from app.main import create_app
+    from app.pagination import decode_sync_token
+
+    primary = tmp_path / "primary.db"
+    replicas = [tmp_path / "replica0.db", tmp_path / "replica1.db"]
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{primary}"))
+
+    factory_app = create_app(Settings(
+        SECRET_KEY="replica-secret-" + "x" * 32,
+        DATABASE_URL=f"sqlite:///{primary}",
+        DATABASE_REPLICA_URLS=[f"sqlite:///{path}" for path in replicas],
+        RATE_LIMIT_ENABLED=False,
+    ))
+
+    with TestClient(factory_app, raise_server_exceptions=False) as c:
+        database = factory_app.state.database
+        headers = auth_headers(c, "replicas@example.com")
+
+        # Registering and logging in count as writes too
+        assert database.recent_writers.get(1) is True
+
+        def titles():
+            response = c.get("/tasks", headers=headers)
+            assert response.status_code == 200
+            return {task["title"] for task in response.json()}
+
+        c.post("/tasks", json={"title": "primary", "priority": 1}, headers=headers)
+
+        # "Replicate", then make each copy tell us it served the read
+        for index, path in enumerate(replicas):
+            shutil.copy(primary, path)
+            with sqlite3.connect(path) as conn:
+                conn.execute(
+                    "INSERT INTO tasks (title, priority, completed, user_id) "
+                    "SELECT ?, 1, 0, id FROM users",
+                    (f"replica{index}",),
+                )
+                conn.execute("UPDATE users SET tasks_version = 999")
+
+        # Just wrote: reads stay on the primary
+        assert titles() == {"primary"}
+
+        database.recent_writers.clear()
+        served = [titles() for _ in range(4)]
+        assert served[0] == served[2] and served[1] == served[3]
+        assert sorted(map(sorted, served[:2])) == [
+            ["primary", "replica0"],
+            ["primary", "replica1"],
+        ]
+
+        # Routes marked reads_from_primary never see a replica
+        token = c.get("/tasks/changes", headers=headers).json()["next"]
+        assert decode_sync_token(token)[1] != 999
+
+        # replica1 goes away: the read that hits it fails, then it's
+        # ejected and reads continue on replica0
+        database.replicas[1].engine.dispose()
+        replicas[1].unlink()
+        replicas[1].mkdir()
+
+        statuses = [c.get("/tasks", headers=headers).status_code for _ in range(2)]
+        assert sorted(statuses) == [200, 500]
+        assert [titles(), titles()] == [{"primary", "replica0"}] * 2
+
+        pools = c.get("/readyz").json()["pools"]
+        assert pools["replica1"]["ejected"] is True
+        assert pools["replica0"]["ejected"] is False
+
+        database.routing = "least_connections"
+        assert database.pick_replica() is database.replicas[0]
+
+
+def test_task_list_cache_serves_repeats_without_queries(client, request_queries):
+    headers = auth_headers(client, "list-cache@example.com")
+    other = auth_headers(client, "list-cache-other@example.com")
+
+    for i in range(3):
+        client.post("/tasks", json={"title": f"T{i}", "priority": 1}, headers=headers)
+    client.post("/tasks", json={"title": "Not mine", "priority": 1}, headers=other)
+
+    first = client.get("/tasks?limit=2", headers=headers)
+    assert request_queries[-1].count == 2
+
+    again = client.get("/tasks?limit=2", headers=headers)
+    assert request_queries[-1].count == 0
+    assert again.content == first.content
+    for header in ("ETag", "X-Next-Cursor", "Cache-Control"):
+        assert again.headers[header] == first.headers[header]
+
+    assert client.get(
+        "/tasks?limit=2", headers={**headers, "If-None-Match": first.headers["ETag"]}
+    ).status_code == 304
+    assert request_queries[-1].count == 0
+
+    # Other parameters and other users are separate entries
+    assert len(client.get("/tasks", headers=headers).json()) == 3
+    assert [t["title"] for t in client.get("/tasks", headers=other).json()] == ["Not mine"]
+
+    # The writer's next read sees the write
+    task_id = first.json()[0]["id"]
+    client.patch(f"/tasks/{task_id}", json={"title": "Renamed"}, headers=headers)
+    after = client.get("/tasks?limit=2", headers=headers)
+    assert request_queries[-1].count == 2
+    assert after.json()[0]["title"] == "Renamed"
+    assert after.headers["ETag"] != first.headers["ETag"]
+
+
+def test_memory_cache_backend_is_byte_bounded_lru():
+    from app.response_cache import CachedResponse, MemoryCacheBackend, ResponseCache
+
+    entry = CachedResponse(b"x" * 100, 'W/"1"')
+    size = entry.size("k0")
+
+    backend = MemoryCacheBackend(max_bytes=size * 2)
+    backend.set("k0", entry)
+    backend.set("k1", entry)
+    assert backend.get("k0") is entry       # k1 is now least recent
+    backend.set("k2", entry)
+
+    assert backend.get("k1") is None
+    assert backend.get("k2") is entry
+    assert backend.stats() == {
+        "entries": 2,
+        "bytes": size * 2,
+        "max_bytes": size * 2,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+    # Larger than the whole budget: never stored
+    backend.set("huge", CachedResponse(b"x" * size * 2, 'W/"2"'))
+    assert backend.get("huge") is None
+
+    cache = ResponseCache(backend)
+    key = cache.key(7, "limit=2")
+    cache.invalidate(7)
+    assert cache.key(7, "limit=2") != key
+    assert cache.key(8, "limit=2").startswith("8:")
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, request_queries):
+    client.post(
+        "/auth/register",
+        json={"email": "logout@example.com", "password": "testpassword"}
+    )
+
+    def login():
+        return client.post(
+            "/auth/login",
+            data={"username": "logout@example.com", "password": "testpassword"}
+        ).json()
+
+    session, other = login(), login()
+    headers = {"Authorization": f"Bearer {session['access_token']}"}
+
+    assert client.get("/tasks", headers=headers).status_code == 200
+
+    response = client.post(
+        "/auth/logout",
+        json={"refresh_token": session["refresh_token"]},
+        headers=headers,
+    )
+    assert response.status_code == 204
+
+    # Rejected in memory, before any query runs
+    response = client.get("/tasks", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+    assert request_queries[-1].count == 0
+
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": session["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+    # The other session is untouched
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+    assert client.get("/tasks", headers=other_headers).status_code == 200
+    assert client.post(
+        "/auth/refresh", json={"refresh_token": other["refresh_token"]}
+    ).status_code == 200
+
+
+def test_logout_all_revokes_every_earlier_session(client):
+    first = auth_headers(client, "everywhere@example.com")
+    second = client.post(
+        "/auth/login",
+        data={"username": "everywhere@example.com", "password": "testpassword"}
+    ).json()
+
+    assert client.post("/auth/logout-all", headers=first).status_code == 204
+
+    assert client.get("/tasks", headers=first).status_code == 401
+    assert client.get(
+        "/tasks", headers={"Authorization": f"Bearer {second['access_token']}"}
+    ).status_code == 401
+    assert client.post(
+        "/auth/refresh", json={"refresh_token": second["refresh_token"]}
+    ).status_code == 401
+
+    # Logging in again afterwards works
+    fresh = auth_headers(client, "everywhere@example.com")
+    assert client.get("/tasks", headers=fresh).status_code == 200
+
+
+def test_denylist_syncs_from_revocations_and_prunes(client):
+    import time
+    from datetime import datetime, timedelta
+
+    from app.models import TokenRevocationDB
+    from app.revocation import Denylist, purge_revocations, sync_denylist
+
+    user_id = client.post(
+        "/auth/register",
+        json={"email": "sync@example.com", "password": "testpassword"}
+    ).json()["id"]
+
+    now = datetime.utcnow()
+    db = next(app.dependency_overrides[get_db]())
+    db.add_all([
+        TokenRevocationDB(
+            user_id=user_id, jti="live", revoked_at=now,
+            expires_at=now + timedelta(minutes=5),
+        ),
+        TokenRevocationDB(
+            user_id=user_id, jti="expired", revoked_at=now - timedelta(hours=1),
+            expires_at=now - timedelta(minutes=1),
+        ),
+        TokenRevocationDB(
+            user_id=user_id, jti=None, revoked_at=now,
+            expires_at=now + timedelta(minutes=5),
+        ),
+    ])
+    db.commit()
+
+    # Another worker's view: loaded from the table, not from the logout
+    denylist = Denylist()
+    assert sync_denylist(db, denylist) == 2
+    assert denylist.is_revoked("live", user_id, time.time())
+    assert not denylist.is_revoked("expired", user_id, time.time() + 60)
+
+    # The user-wide cutoff covers tokens issued up to it, not after
+    assert denylist.is_revoked("other", user_id, time.time() - 60)
+    assert not denylist.is_revoked("other", user_id, time.time() + 60)
+    assert not denylist.is_revoked("other", user_id + 1, 0)
+
+    # Later syncs only read recent rows; expired entries are dropped
+    assert sync_denylist(db, denylist) == 2
+    denylist.prune(time.time() + 600)
+    assert len(denylist) == 0
+
+    assert purge_revocations(db) == 1
+    db.close()
+
+
+def test_seed_bulk_loads_deterministic_users_and_tasks(tmp_path):
+    import io
+    import random
+
+    from sqlalchemy import func, select, text
+
+    from app.models import TaskCounterDB, TaskDB
+    from app.seed import seed_database, task_counts
+
+    assert sum(task_counts(50, 20, "zipf", random.Random(0))) == 1000
+    assert task_counts(3, 20, "uniform", random.Random(0)) == [20, 20, 20]
+
+    def load(name):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        report = seed_database(
+            db, users=20, tasks_per_user=30, distribution="random",
+            seed=7, hashed_password="not-a-real-hash", batch_size=50,
+            stream=io.StringIO(),
+        )
+        return db, report
+
+    db, report = load("a.db")
+    other, _ = load("b.db")
+
+    tasks = select(
+        TaskDB.id, TaskDB.title, TaskDB.priority, TaskDB.completed, TaskDB.user_id
+    ).order_by(TaskDB.id)
+
+    rows = db.execute(tasks).all()
+    assert len(rows) == report.tasks
+    assert rows == other.execute(tasks).all()
+    assert (report.first_user_id, report.last_user_id) == (1, 20)
+
+    # Counters and search were rebuilt, and the triggers are back
+    assert db.scalar(select(func.sum(TaskCounterDB.total))) == report.tasks
+    word = rows[0].title.split()[1]
+    assert db.scalar(text(
+        "SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH :word"
+    ), {"word": word}) == sum(word in row.title.split() for row in rows)
+
+    db.add(TaskDB(title="After seeding", priority=1, user_id=1))
+    db.commit()
+    assert db.scalar(select(func.sum(TaskCounterDB.total))) == report.tasks + 1
+
+    # A second run appends after the existing ids
+    again = seed_database(
+        db, users=2, tasks_per_user=1, hashed_password="x", stream=io.StringIO()
+    )
+    assert again.first_user_id == 21
+    db.close()
+    other.close()
+
+
+def test_autogenerate_ignores_ddl_managed_search_objects(tmp_path, monkeypatch):
+    import os
+
+    from alembic import command
+    from alembic.config import Config
+
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'al.db'}")
+    # No ini file, so env.py leaves the test run's logging alone
+    config = Config()
+    config.set_main_option(
+        "script_location",
+        os.path.join(os.path.dirname(__file__), "..", "migrations"),
+    )
+
+    command.upgrade(config, "head")
+    # Raises if the models and the migrated schema disagree, e.g. by
+    # proposing to drop tasks_fts
+    command.check(config)
+
+
+def test_denylist_load_without_schema_logs_one_line(tmp_path, caplog):
+    import asyncio
+
+    from app.config import Settings
+    from app.database import Database
+    from app.revocation import denylist, load_denylist
+
+    database = Database(Settings(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'empty.db'}",
+        SECRET_KEY="x" * 32,
+    ))
+
+    with caplog.at_level("WARNING", logger="app.revocation"):
+        asyncio.run(load_denylist(database))
+    asyncio.run(database.dispose())
+
+    [record] = caplog.records
+    assert "no such table: token_revocations" in record.getMessage()
+    assert record.exc_info is None
+    assert len(denylist) == 0
@@ -11,6 +11,17 @@ type Task = {
 
 type Filter = "all" | "active" | "completed";
 
+// Server default for TASK_BATCH_MAX_ITEMS; larger batches are rejected
+const BATCH_MAX_ITEMS = 500;
+
+function chunks<T>(items: T[], size: number): T[][] {
+  const result: T[][] = [];
+  for (let i = 0; i < items.length; i += size) {
+    result.push(items.slice(i, i + size));
+  }
+  return result;
+}
+
 export default function TasksPage() {
   const { logout } = useAuth();
 
@@ -35,8 +46,20 @@ export default function TasksPage() {
   useEffect(() => {
     const fetchTasks = async () => {
       try {
-        const res = await api.get<Task[]>("/tasks");
-        setTasks(res.data);
+        // Walk keyset pages until the server stops handing out cursors
+        const loaded: Task[] = [];
+        let cursor: string | undefined;
+
+        do {
+          const res = await api.get<Task[]>("/tasks", {
+            params: { limit: 100, cursor },
+          });
+
+          loaded.push(...res.data);
+          cursor = res.headers["x-next-cursor"];
+        } while (cursor);
+
+        setTasks(loaded);
       } catch {
         setError("Failed to load tasks.");
       } finally {
@@ -89,7 +112,7 @@ export default function TasksPage() {
     );
 
     try {
-      await api.put(`/tasks/${task.id}`, {
+      await api.patch(`/tasks/${task.id}`, {
         completed: !task.completed,
       });
     } catch {
@@ -115,6 +138,60 @@ export default function TasksPage() {
     }
   };
 
+  // ==========================
+  // BULK ACTIONS
+  // ==========================
+
+  const completeAll = async () => {
+    const open = tasks.filter((t) => !t.completed);
+    if (open.length === 0) return;
+
+    const previous = [...tasks];
+
+    setTasks((prev) => prev.map((t) => ({ ...t, completed: true })));
+
+    const updated = new Set<number>();
+
+    try {
+      for (const chunk of chunks(open, BATCH_MAX_ITEMS)) {
+        await api.patch("/tasks/batch", {
+          items: chunk.map((t) => ({ id: t.id, completed: true })),
+        });
+        chunk.forEach((t) => updated.add(t.id));
+      }
+    } catch {
+      // Earlier chunks went through; only undo the rest
+      setTasks(
+        previous.map((t) => (updated.has(t.id) ? { ...t, completed: true } : t))
+      );
+      setError("Failed to update tasks.");
+    }
+  };
+
+  const clearCompleted = async () => {
+    const done = tasks.filter((t) => t.completed);
+    if (done.length === 0) return;
+
+    const previous = [...tasks];
+
+    setTasks((prev) => prev.filter((t) => !t.completed));
+
+    const deleted = new Set<number>();
+
+    try {
+      for (const chunk of chunks(done, BATCH_MAX_ITEMS)) {
+        await api.delete("/tasks/batch", {
+          data: { ids: chunk.map((t) => t.id) },
+        });
+        chunk.forEach((t) => deleted.add(t.id));
+      }
+    } catch {
+      // Earlier chunks went through; only restore the rest
+      setTasks(previous.filter((t) => !deleted.has(t.id)));
+      setError("Failed to delete tasks.");
+    }
+  };
+
   // ==========================
   // EDIT
   // ==========================
@@ -138,7 +215,7 @@ export default function TasksPage() {
     setEditingId(null);
 
     try {
-      await api.put(`/tasks/${task.id}`, {
+      await api.patch(`/tasks/${task.id}`, {
         title: editingTitle.trim(),
       });
     } catch {
@@ -258,12 +335,28 @@ export default function TasksPage() {
           ))}
         </div>
 
-        <button
-          onClick={() => setSortHighFirst(!sortHighFirst)}
-          className="text-neutral-400 hover:text-white transition"
-        >
-          Sort: {sortHighFirst ? "High → Low" : "Low → High"}
-        </button>
+        <div className="flex gap-4">
+          <button
+            onClick={completeAll}
+            className="text-neutral-400 hover:text-white transition"
+          >
+            Complete all
+          </button>
+
+          <button
+            onClick={clearCompleted}
+            className="text-neutral-400 hover:text-white transition"
+          >
+            Clear completed
+          </button>
+
+          <button
+            onClick={() => setSortHighFirst(!sortHighFirst)}
+            className="text-neutral-400 hover:text-white transition"
+          >
+            Sort: {sortHighFirst ? "High → Low" : "Low → High"}
+          </button>
+        </div>
       </div>
 
       {/* TASK LIST */}
@@ -94,6 +94,8 @@ api.interceptors.response.use(
         const newAccessToken = response.data.access_token;
 
         localStorage.setItem("access_token", newAccessToken);
+        // Refresh tokens are single-use; keep the rotated one
+        localStorage.setItem("refresh_token", response.data.refresh_token);
 
         processQueue(null, newAccessToken);
 